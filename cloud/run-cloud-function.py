@@ -6,21 +6,187 @@ This can be deployed as a Cloud Function or used as an HTTP endpoint
 for Cloud Run/Cloud Scheduler.
 """
 
+import gzip
 import os
 import json
 import logging
+import shutil
 import sys
+import tarfile
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
+try:
+    from flask import Flask, request
+except ImportError:  # Not needed when deployed as a Cloud Function
+    Flask = None
+
 from download.download_videos import VideoDownloader
 from storage.gcs_storage import GCSStorage
+from utils.catalog import load_catalog
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Number of finished transcripts to collect before uploading them as one group
+UPLOAD_BATCH_SIZE = 100
+
+
+# yt-dlp keeps player JS and signature functions here; persisted to GCS across cold starts
+YTDLP_CACHE_DIR = Path('/tmp/yt-dlp-cache')
+YTDLP_CACHE_GCS_PATH = 'cache/yt-dlp-cache.tar.gz'
+# Guards restoring the shared cache directory while other requests use it
+_ytdlp_cache_lock = threading.Lock()
+
+# The catalog is shared by concurrent requests on a warm instance and only
+# re-downloaded when its GCS generation changes; each request gets its own
+# scratch directory for everything else
+CATALOG_CACHE_PATH = Path('/tmp/khan-downloader/catalog.json')
+_catalog_lock = threading.Lock()
+
+YOUTUBE_WATCH_URL = "https://www.youtube.com/watch?v="
+
+# Shared by every transcript worker; nothing in it varies per video
+YTDLP_TRANSCRIPT_OPTS = {
+    'writesubtitles': True,
+    'writeautomaticsub': True,
+    'subtitleslangs': ['en'],
+    'subtitlesformat': 'vtt',
+    'skip_download': True,
+    'quiet': True,
+    'socket_timeout': 30,
+    'cachedir': str(YTDLP_CACHE_DIR),
+}
+
+# One YoutubeDL per worker thread, reused across all videos that thread handles
+_ydl_local = threading.local()
+
+
+def _get_ydl():
+    """
+    Return this thread's YoutubeDL instance, creating it on first use.
+    
+    YoutubeDL is not safe to share across concurrent downloads, but its
+    extractor loading and cache setup only need to happen once per thread.
+    
+    Returns:
+        YoutubeDL instance owned by the calling thread
+    """
+    ydl = getattr(_ydl_local, 'ydl', None)
+    if ydl is None:
+        import yt_dlp
+        
+        ydl = yt_dlp.YoutubeDL(YTDLP_TRANSCRIPT_OPTS)
+        _ydl_local.ydl = ydl
+    return ydl
+
+
+def _fetch_transcript(video_meta):
+    """
+    Fetch a single transcript with yt-dlp, keeping it in memory.
+    
+    Resolves the subtitle URL without downloading anything, then reads the
+    VTT body directly so nothing is staged on local disk.
+    
+    Args:
+        video_meta: Video metadata dictionary from the catalog
+        
+    Returns:
+        Tuple of (youtube_id, success, gzip-compressed VTT bytes or error message)
+    """
+    youtube_id = video_meta.get('youtube_id') or video_meta.get('id')
+    if not youtube_id:
+        return None, False, 'missing youtube_id'
+    
+    try:
+        ydl = _get_ydl()
+        info = ydl.extract_info(YOUTUBE_WATCH_URL + youtube_id, download=False)
+        subtitle = (info.get('requested_subtitles') or {}).get('en')
+        if not subtitle:
+            return youtube_id, False, 'transcript not found'
+        
+        data = subtitle.get('data')
+        if data is None:
+            with ydl.urlopen(subtitle['url']) as response:
+                data = response.read()
+        elif isinstance(data, str):
+            data = data.encode('utf-8')
+        # VTT is highly compressible; compress here so it happens in parallel
+        return youtube_id, True, gzip.compress(data, compresslevel=6)
+    except Exception as e:
+        return youtube_id, False, str(e)
+
+
+def _restore_ytdlp_cache(gcs, temp_dir):
+    """
+    Restore the yt-dlp cache directory from GCS if this instance has none.
+    
+    Args:
+        gcs: GCSStorage instance
+        temp_dir: Local scratch directory for the archive
+    """
+    archive = temp_dir / "yt-dlp-cache.tar.gz"
+    with _ytdlp_cache_lock:
+        if YTDLP_CACHE_DIR.exists() or not gcs.file_exists(YTDLP_CACHE_GCS_PATH):
+            return
+        
+        try:
+            if gcs.download_file(YTDLP_CACHE_GCS_PATH, archive):
+                with tarfile.open(archive, 'r:gz') as tar:
+                    tar.extractall(YTDLP_CACHE_DIR.parent, filter='data')
+                logger.info("Restored yt-dlp cache from GCS")
+        except Exception as e:
+            logger.warning(f"Could not restore yt-dlp cache: {e}")
+        finally:
+            archive.unlink(missing_ok=True)
+
+
+def _save_ytdlp_cache(gcs, temp_dir):
+    """
+    Upload the yt-dlp cache directory to GCS for the next cold start.
+    
+    Args:
+        gcs: GCSStorage instance
+        temp_dir: Local scratch directory for the archive
+    """
+    if not YTDLP_CACHE_DIR.exists():
+        return
+    
+    archive = temp_dir / "yt-dlp-cache.tar.gz"
+    try:
+        with tarfile.open(archive, 'w:gz') as tar:
+            tar.add(YTDLP_CACHE_DIR, arcname=YTDLP_CACHE_DIR.name)
+        gcs.upload_file(archive, YTDLP_CACHE_GCS_PATH, content_type='application/gzip')
+    except Exception as e:
+        logger.warning(f"Could not save yt-dlp cache: {e}")
+    finally:
+        archive.unlink(missing_ok=True)
+
+
+def _fetch_catalog(gcs, catalog_path):
+    """
+    Bring the shared local catalog up to date with GCS.
+    
+    The lock keeps concurrent requests from downloading over each other;
+    the file is replaced atomically, so requests already reading it keep
+    their copy.
+    
+    Args:
+        gcs: GCSStorage instance
+        catalog_path: Catalog path in the GCS bucket
+        
+    Returns:
+        Local catalog path
+    """
+    with _catalog_lock:
+        gcs.download_file_if_changed(catalog_path, CATALOG_CACHE_PATH)
+    return CATALOG_CACHE_PATH
+
 
 def discover_and_download(request):
     """
@@ -34,6 +200,7 @@ def discover_and_download(request):
         "gcs_bucket": "khan-academy-videos"  # Optional, uses env var if not provided
     }
     """
+    temp_dir = None
     try:
         # Parse request
         if isinstance(request, str):
@@ -49,80 +216,66 @@ def discover_and_download(request):
         logger.info(f"Received command: {command}")
         logger.info(f"Bucket: {bucket_name}, Max videos: {max_videos}")
         
-        # Initialize GCS storage
-        gcs = GCSStorage(bucket_name)
+        # Initialize GCS storage; every upload below reuses its keep-alive connection pool
+        gcs = GCSStorage(bucket_name, max_connections=int(os.environ.get('GCS_MAX_CONNECTIONS', '32')))
         
-        # Create temporary local directory
-        temp_dir = Path('/tmp/khan-downloader')
-        temp_dir.mkdir(parents=True, exist_ok=True)
+        # Private scratch directory: requests run concurrently on one instance
+        temp_dir = Path(tempfile.mkdtemp(prefix='khan-downloader-'))
         
         # Handle transcript-only mode
         if command == 'transcripts_only':
             logger.info("Starting transcript-only download...")
             
-            # Use yt-dlp directly for transcript-only download
-            import yt_dlp
+            # Download catalog from GCS unless the warm instance already has it
+            local_catalog = _fetch_catalog(gcs, catalog_path)
             
-            # Download catalog from GCS if needed
-            local_catalog = temp_dir / "catalog.json"
-            if not local_catalog.exists():
-                gcs.download_file(catalog_path, local_catalog)
+            # Warm yt-dlp's player cache so cold starts skip signature extraction
+            _restore_ytdlp_cache(gcs, temp_dir)
             
-            with open(local_catalog, 'r') as f:
-                catalog = json.load(f)
+            # Only materialize the entries we are going to process
+            catalog = load_catalog(local_catalog, max_videos)
             
-            if not isinstance(catalog, list):
-                catalog = [catalog]
+            # Only ids are kept per outcome; the catalog already holds the metadata
+            ok_ids = []
+            failed_ids = []
             
-            if max_videos:
-                catalog = catalog[:max_videos]
+            # Finished transcripts are uploaded in groups rather than one at a time
+            pending = []
             
-            results = []
-            failed = []
-            transcripts_dir = temp_dir / "transcripts"
-            transcripts_dir.mkdir(parents=True, exist_ok=True)
+            def flush_uploads():
+                uploaded = set(gcs.upload_strings(
+                    ((data, f"transcripts/{youtube_id}.vtt", 'text/vtt')
+                     for youtube_id, data in pending),
+                    content_encoding='gzip'
+                ))
+                for youtube_id, _ in pending:
+                    if f"transcripts/{youtube_id}.vtt" in uploaded:
+                        ok_ids.append(youtube_id)
+                    else:
+                        failed_ids.append(youtube_id)
+                pending.clear()
             
-            for video_meta in catalog:
-                youtube_id = video_meta.get('youtube_id') or video_meta.get('id')
-                if not youtube_id:
-                    failed.append(video_meta)
-                    continue
-                
-                video_url = f"https://www.youtube.com/watch?v={youtube_id}"
-                ydl_opts = {
-                    'writesubtitles': True,
-                    'writeautomaticsub': True,
-                    'subtitleslangs': ['en'],
-                    'subtitlesformat': 'vtt',
-                    'skip_download': True,
-                    'outtmpl': str(transcripts_dir / f'{youtube_id}.%(ext)s'),
-                    'quiet': True,
-                }
-                
-                try:
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        ydl.download([video_url])
-                    
-                    transcript_path = transcripts_dir / f"{youtube_id}.en.vtt"
-                    if not transcript_path.exists():
-                        transcript_path = transcripts_dir / f"{youtube_id}.vtt"
-                    
-                    if transcript_path.exists():
-                        # Upload to GCS
-                        gcs_path = f"transcripts/{youtube_id}.vtt"
-                        gcs.upload_file(transcript_path, gcs_path, content_type='text/vtt')
-                        transcript_path.unlink()  # Delete local
-                        results.append({'video_id': youtube_id, 'success': True})
+            # Transcript fetches are network-bound, so run them concurrently
+            max_workers = int(os.environ.get('TRANSCRIPT_WORKERS', '16'))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(_fetch_transcript, video_meta) for video_meta in catalog]
+                for future in as_completed(futures):
+                    youtube_id, ok, detail = future.result()
+                    if ok:
+                        pending.append((youtube_id, detail))
+                        if len(pending) >= UPLOAD_BATCH_SIZE:
+                            flush_uploads()
                     else:
-                        failed.append(video_meta)
-                except Exception as e:
-                    logger.error(f"Failed {youtube_id}: {e}")
-                    failed.append(video_meta)
+                        if youtube_id:
+                            logger.error(f"Failed {youtube_id}: {detail}")
+                        failed_ids.append(youtube_id)
+            flush_uploads()
+            _save_ytdlp_cache(gcs, temp_dir)
             
             # Process transcripts
             from process.process_transcripts import TranscriptProcessor
             processor = TranscriptProcessor(
-                transcripts_dir=transcripts_dir,
+                transcripts_dir=temp_dir / "transcripts",
                 output_dir=temp_dir / "processed",
                 gcs_storage=gcs,
                 upload_to_gcs=True
@@ -131,15 +284,15 @@ def discover_and_download(request):
             # For now, just return results
             
             summary = {
-                'successful': len(results),
-                'failed': len(failed),
+                'successful': len(ok_ids),
+                'failed': len(failed_ids),
                 'total': len(catalog)
             }
             gcs.upload_json(summary, 'metadata/transcript_download_results.json')
             
             return {
                 'status': 'success',
-                'message': f'Downloaded {len(results)} transcripts',
+                'message': f'Downloaded {len(ok_ids)} transcripts',
                 'results': summary
             }, 200
         
@@ -162,10 +315,9 @@ def discover_and_download(request):
         # Download videos
         logger.info("Starting video download...")
         
-        # Download catalog from GCS if needed
-        local_catalog = temp_dir / "catalog.json"
-        if not local_catalog.exists():
-            gcs.download_file(catalog_path, local_catalog)
+        # Download catalog from GCS unless it was just written above or is already current
+        if command != 'discover_and_download':
+            local_catalog = _fetch_catalog(gcs, catalog_path)
         
         # Initialize downloader
         downloader = VideoDownloader(
@@ -201,12 +353,13 @@ def discover_and_download(request):
             'status': 'error',
             'message': str(e)
         }, 500
+    finally:
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
 
 
-# For Cloud Run / HTTP
-if __name__ == "__main__":
-    from flask import Flask, request
-    
+# For Cloud Run / HTTP (served by gunicorn as run-cloud-function:app)
+if Flask is not None:
     app = Flask(__name__)
     
     @app.route('/run', methods=['POST'])
@@ -217,6 +370,9 @@ if __name__ == "__main__":
     @app.route('/health', methods=['GET'])
     def health():
         return {'status': 'healthy'}, 200
-    
+
+
+if __name__ == "__main__":
+    # Local development only; deployments run under gunicorn
     port = int(os.environ.get('PORT', 8080))
     app.run(host='0.0.0.0', port=port)
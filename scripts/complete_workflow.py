@@ -13,13 +13,13 @@ import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
 
 import logging
 import argparse
-import subprocess
-import json
 from storage.supabase_storage import SupabaseStorage
 from storage.gcs_storage import GCSStorage
+from utils.catalog import save_catalog
 
 logging.basicConfig(
     level=logging.INFO,
@@ -29,20 +29,18 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def run_command(cmd, description):
-    """Run a command and log the result."""
+def run_step(run, args, description):
+    """Run a pipeline step in-process and log the result."""
     logger.info(f"\n{'='*60}")
     logger.info(f"Step: {description}")
-    logger.info(f"Command: {' '.join(cmd)}")
     logger.info(f"{'='*60}\n")
     
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    
-    if result.returncode != 0:
-        logger.error(f"Command failed: {result.stderr}")
+    try:
+        run(args)
+    except Exception as e:
+        logger.error(f"Step failed: {e}", exc_info=True)
         return False
     
-    logger.info(result.stdout)
     return True
 
 
@@ -78,13 +76,14 @@ def main():
         logger.info("Step 1: Discovering videos...")
         
         if args.topic_url:
-            cmd = [
-                "python3", "scripts/discover_videos_scraper.py",
-                "--topic-url", args.topic_url,
-                "--output", str(catalog_path),
-                "--max-videos", str(args.max_videos),
-            ]
-            if not run_command(cmd, "Discover videos from topic"):
+            import discover_videos_scraper
+            step_args = argparse.Namespace(
+                topic_url=args.topic_url,
+                output=catalog_path,
+                max_videos=args.max_videos,
+                rate_limit=1.0,
+            )
+            if not run_step(discover_videos_scraper.run, step_args, "Discover videos from topic"):
                 logger.error("Discovery failed")
                 return
         elif args.youtube_ids:
@@ -98,9 +97,7 @@ def main():
                     'description': None,
                 })
             
-            catalog_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(catalog_path, 'w', encoding='utf-8') as f:
-                json.dump(videos, f, indent=2)
+            save_catalog(videos, catalog_path)
             logger.info(f"Created catalog with {len(videos)} videos")
         else:
             logger.warning("No discovery method specified. Use --topic-url or --youtube-ids")
@@ -110,20 +107,20 @@ def main():
     if not args.skip_download:
         logger.info("\nStep 2: Downloading transcripts...")
         
-        if args.youtube_ids:
-            cmd = [
-                "python3", "scripts/download_transcripts_only.py",
-                "--youtube-ids", args.youtube_ids,
-                "--max", str(args.max_videos),
-            ]
-        else:
-            cmd = [
-                "python3", "scripts/download_transcripts_only.py",
-                "--catalog", str(catalog_path),
-                "--max", str(args.max_videos),
-            ]
+        import download_transcripts_only
+        step_args = argparse.Namespace(
+            catalog=catalog_path,
+            youtube_ids=args.youtube_ids,
+            gcs_bucket=None,
+            gcs_credentials=None,
+            output_dir=None,
+            max=args.max_videos,
+            discover_first=False,
+            workers=8,
+            rate_limit=0.1,
+        )
         
-        if not run_command(cmd, "Download transcripts"):
+        if not run_step(download_transcripts_only.run, step_args, "Download transcripts"):
             logger.error("Download failed")
             return
     
@@ -145,16 +142,18 @@ def main():
             logger.error(f"Failed to connect to Supabase: {e}")
             return
         
-        cmd = [
-            "python3", "scripts/index_transcripts_supabase.py",
-            "--transcripts-dir", str(transcripts_dir),
-            "--catalog", str(catalog_path),
-        ]
-        
-        if args.generate_embeddings:
-            cmd.append("--generate-embeddings")
+        import index_transcripts_supabase
+        step_args = argparse.Namespace(
+            transcripts_dir=transcripts_dir,
+            catalog=catalog_path,
+            supabase_url=None,
+            supabase_key=None,
+            generate_embeddings=args.generate_embeddings,
+            max=None,
+            workers=8,
+        )
         
-        if not run_command(cmd, "Index transcripts in Supabase"):
+        if not run_step(index_transcripts_supabase.run, step_args, "Index transcripts in Supabase"):
             logger.error("Indexing failed")
             return
     
@@ -17,7 +17,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 from api.khan_academy_api import KhanAcademyAPI
 import logging
 import argparse
-import json
+from collections import Counter
 
 logging.basicConfig(
     level=logging.INFO,
@@ -57,15 +57,10 @@ def main():
     print("="*60)
     
     # Group by topic/subject
-    topics = {}
-    for video in all_videos:
-        topic = video.get('topic', {}).get('title', 'Unknown')
-        if topic not in topics:
-            topics[topic] = 0
-        topics[topic] += 1
+    topics = Counter(video.get('topic', {}).get('title', 'Unknown') for video in all_videos)
     
     print("\nVideos by topic:")
-    for topic, count in sorted(topics.items(), key=lambda x: x[1], reverse=True):
+    for topic, count in topics.most_common():
         print(f"  {topic}: {count} videos")
 
 
@@ -11,9 +11,9 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
 from api.khan_scraper import KhanAcademyScraper
+from utils.catalog import save_catalog
 import logging
 import argparse
-import json
 from tqdm import tqdm
 
 logging.basicConfig(
@@ -37,7 +37,16 @@ def main():
                        help="Delay between requests in seconds")
     
     args = parser.parse_args()
+    run(args)
+
+
+def run(args: argparse.Namespace):
+    """
+    Discover videos and save the catalog.
     
+    Args:
+        args: Parsed arguments (topic_url, output, max_videos, rate_limit)
+    """
     scraper = KhanAcademyScraper(rate_limit_delay=args.rate_limit)
     
     if args.topic_url:
@@ -48,9 +57,7 @@ def main():
         logger.info(f"Found {len(videos)} videos")
         
         # Save catalog
-        args.output.parent.mkdir(parents=True, exist_ok=True)
-        with open(args.output, 'w', encoding='utf-8') as f:
-            json.dump(videos, f, indent=2, ensure_ascii=False)
+        save_catalog(videos, args.output)
         
         logger.info(f"Saved catalog to: {args.output}")
     else:
@@ -62,18 +69,17 @@ def main():
             logger.info(f"Found {len(video_urls)} video URLs in sitemap")
             logger.info("Scraping video pages...")
             
-            videos = []
-            for url in tqdm(video_urls[:args.max_videos] if args.max_videos else video_urls):
-                video_data = scraper.scrape_video_page(url)
-                if video_data:
-                    videos.append(video_data)
+            video_urls = video_urls[:args.max_videos] if args.max_videos else video_urls
+            videos = [
+                video_data
+                for video_data in tqdm(scraper.scrape_video_pages(video_urls), total=len(video_urls))
+                if video_data
+            ]
             
             logger.info(f"Successfully scraped {len(videos)} videos")
             
             # Save catalog
-            args.output.parent.mkdir(parents=True, exist_ok=True)
-            with open(args.output, 'w', encoding='utf-8') as f:
-                json.dump(videos, f, indent=2, ensure_ascii=False)
+            save_catalog(videos, args.output)
             
             logger.info(f"Saved catalog to: {args.output}")
         else:
@@ -11,6 +11,8 @@ import json
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
+from utils.subtitles import downloaded_subtitle_path
+
 def download_transcript(youtube_id, output_dir="data/transcripts/raw"):
     """Download transcript for a single YouTube video."""
     output_path = Path(output_dir)
@@ -33,12 +35,10 @@ def download_transcript(youtube_id, output_dir="data/transcripts/raw"):
             print(f"Downloading transcript for: {youtube_id}")
             info = ydl.extract_info(video_url, download=True)
             
-            # Find the downloaded transcript file
-            transcript_path = output_path / f"{youtube_id}.en.vtt"
-            if not transcript_path.exists():
-                transcript_path = output_path / f"{youtube_id}.vtt"
+            # yt-dlp reports where it wrote the transcript
+            transcript_path = downloaded_subtitle_path(info)
             
-            if transcript_path.exists():
+            if transcript_path:
                 print(f"✅ Successfully downloaded transcript: {transcript_path}")
                 print(f"   Video title: {info.get('title', 'Unknown')}")
                 print(f"   Duration: {info.get('duration', 0)} seconds")
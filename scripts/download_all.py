@@ -20,6 +20,8 @@ from storage.gcs_storage import GCSStorage
 import logging
 import argparse
 import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
 
 logging.basicConfig(
     level=logging.INFO,
@@ -49,6 +51,8 @@ def main():
                        help="Path to GCS credentials JSON file (or set GOOGLE_APPLICATION_CREDENTIALS env var)")
     parser.add_argument("--keep-local", action="store_true",
                        help="Keep local files after uploading to GCS (default: delete after upload)")
+    parser.add_argument("--force", action="store_true",
+                       help="Download videos again even if a previous run finished them or they are already in the GCS bucket")
     
     args = parser.parse_args()
     
@@ -80,6 +84,16 @@ def main():
             logger.error("Continuing with local storage only")
             upload_to_gcs = False
     
+    processor = None
+    if not args.skip_transcript:
+        processor = TranscriptProcessor(
+            transcripts_dir=args.video_dir,
+            output_dir=args.transcript_dir,
+            gcs_storage=gcs_storage,
+            upload_to_gcs=upload_to_gcs
+        )
+    processed = []
+    
     # Download videos
     if not args.skip_video:
         logger.info("Downloading videos...")
@@ -89,9 +103,38 @@ def main():
             download_transcript=True,
             gcs_storage=gcs_storage,
             upload_to_gcs=upload_to_gcs,
-            delete_after_upload=upload_to_gcs and not args.keep_local
+            delete_after_upload=upload_to_gcs and not args.keep_local,
+            resume=not args.force
         )
-        results, failed = downloader.download_from_catalog(args.catalog, max_videos=args.max)
+        
+        if processor:
+            # Process each transcript while the next video downloads
+            transcript_queue = queue.Queue(maxsize=32)
+            
+            def on_result(result):
+                if result.get('transcript_path'):
+                    transcript_queue.put(Path(result['transcript_path']))
+            
+            def download():
+                try:
+                    return downloader.download_from_catalog(args.catalog, max_videos=args.max,
+                                                            on_result=on_result)
+                finally:
+                    transcript_queue.put(None)
+            
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                download_future = executor.submit(download)
+                while (transcript_path := transcript_queue.get()) is not None:
+                    # Skip transcripts already uploaded and deleted by the downloader
+                    if not transcript_path.exists():
+                        continue
+                    try:
+                        processed.append(processor.process_transcript(transcript_path))
+                    except Exception as e:
+                        logger.error(f"Failed to process {transcript_path}: {e}")
+                results, failed = download_future.result()
+        else:
+            results, failed = downloader.download_from_catalog(args.catalog, max_videos=args.max)
         logger.info(f"Downloaded {len(results)} videos, {len(failed)} failed")
         
         # Upload download results to GCS if configured
@@ -108,16 +151,21 @@ def main():
     else:
         logger.info("Skipping video download")
     
-    # Process transcripts
-    if not args.skip_transcript:
-        logger.info("Processing transcripts...")
-        processor = TranscriptProcessor(
-            transcripts_dir=args.video_dir,
-            output_dir=args.transcript_dir,
-            gcs_storage=gcs_storage,
-            upload_to_gcs=upload_to_gcs
-        )
-        processed = processor.process_all_transcripts()
+    # Process transcripts (already done alongside the download unless it was skipped)
+    if processor:
+        if args.skip_video:
+            logger.info("Processing transcripts...")
+            processed = processor.process_all_transcripts()
+        else:
+            # Transcripts of videos skipped on resume never reach on_result, so
+            # pick up whatever is still unprocessed before writing the summary
+            done = {result['video_id'] for result in processed}
+            remaining = [path for path in Path(args.video_dir).glob("*.vtt")
+                         if path.stem.replace('.en', '').replace('.vtt', '') not in done]
+            if remaining:
+                logger.info(f"Processing {len(remaining)} remaining transcripts...")
+                processed += processor.process_transcripts(remaining)
+            processor.save_summary(processed)
         logger.info(f"Processed {len(processed)} transcripts")
         
         # Upload transcript summary to GCS if configured
@@ -15,14 +15,20 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
 from api.khan_academy_api import KhanAcademyAPI
-from storage.gcs_storage import GCSStorage
+from utils.subtitles import downloaded_subtitle_path, vtt_to_text
+from utils.rate_limit import AdaptiveRateLimiter
+from utils.catalog import iter_catalog
+from utils import fast_json
 import logging
 import argparse
-import json
 import yt_dlp
 import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 from tqdm import tqdm
-import time
 
 logging.basicConfig(
     level=logging.INFO,
@@ -32,24 +38,49 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# tmpfs mount used for transient files on Linux
+SHM_DIR = Path("/dev/shm")
+
+
 class TranscriptDownloader:
     """
     Downloads only transcripts from Khan Academy videos.
     Uses yt-dlp to extract transcripts directly without downloading video files.
     """
     
-    def __init__(self, gcs_storage=None, upload_to_gcs=False, output_dir=None):
+    def __init__(self, gcs_storage=None, upload_to_gcs=False, output_dir=None,
+                 workers: int = 8, rate_limit: float = 0.1, upload_workers: int = 4):
         """
         Initialize transcript downloader.
         
         Args:
             gcs_storage: Optional GCS storage instance
             upload_to_gcs: Whether to upload to GCS
-            output_dir: Local output directory (temporary if uploading to GCS)
+            output_dir: Local output directory (defaults to tmpfs when uploading to GCS)
+            workers: Number of transcripts downloaded concurrently
+            rate_limit: Minimum average delay between download starts across all workers, in seconds
+            upload_workers: Number of background threads uploading finished transcripts to GCS
         """
+        self.workers = workers
+        self.upload_workers = upload_workers
+        self._upload_executor = None
+        self._results_log = None
+        self._results_log_lock = threading.Lock()
+        # Uploaded transcripts are deleted by a janitor thread, off the upload path
+        self._delete_queue = queue.Queue()
+        threading.Thread(target=self._delete_uploaded, daemon=True).start()
+        # Shared by all workers so parallelism does not raise the request rate past the limit;
+        # it backs off when YouTube answers with 429 and recovers as requests succeed
+        self.rate_limiter = AdaptiveRateLimiter.from_delay(rate_limit)
         self.gcs_storage = gcs_storage
         self.upload_to_gcs = upload_to_gcs
-        self.output_dir = Path(output_dir) if output_dir else Path("/tmp/transcripts")
+        if output_dir:
+            self.output_dir = Path(output_dir)
+        elif upload_to_gcs and SHM_DIR.is_dir():
+            # Transcripts only pass through on their way to GCS, so keep them in RAM
+            self.output_dir = SHM_DIR / "transcripts"
+        else:
+            self.output_dir = Path("/tmp/transcripts")
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
         # Configure yt-dlp for transcript-only download
@@ -59,64 +90,87 @@ class TranscriptDownloader:
             'subtitleslangs': ['en'],
             'subtitlesformat': 'vtt',
             'skip_download': True,  # Don't download video, only subtitles
-            'quiet': False,
-            'no_warnings': False,
+            'outtmpl': str(self.output_dir / '%(id)s.%(ext)s'),
+            'quiet': True,  # Per-video yt-dlp output interleaves across workers; errors still surface
+            'no_warnings': True,
+            'socket_timeout': 30,  # Don't let a stalled keep-alive socket hang a worker
         }
+        
+        # One YoutubeDL per thread, reused for every video that thread downloads
+        self._local = threading.local()
+        self._ydls = []
+        self._ydls_lock = threading.Lock()
     
-    def download_transcript(self, video_url: str, video_metadata: dict) -> dict:
+    def _get_ydl(self):
+        """
+        Return the calling thread's YoutubeDL, creating it on first use.
+        
+        YoutubeDL is not safe to share across threads, but extractor setup
+        and its HTTP connections only need to be created once per thread.
+        """
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL(dict(self.ydl_opts))
+            self._local.ydl = ydl
+            with self._ydls_lock:
+                self._ydls.append(ydl)
+        return ydl
+    
+    def close(self):
+        """Close every YoutubeDL instance created by this downloader."""
+        with self._ydls_lock:
+            ydls, self._ydls = self._ydls, []
+            self._local = threading.local()
+        for ydl in ydls:
+            ydl.close()
+    
+    def download_transcript(self, video_id: str, video_url: str, video_metadata: dict) -> dict:
         """
         Download transcript for a single video.
         
         Args:
+            video_id: YouTube video ID
             video_url: YouTube URL
             video_metadata: Video metadata dictionary
             
         Returns:
             Result dictionary with transcript info
         """
-        video_id = video_metadata.get('youtube_id') or video_metadata.get('id')
-        logger.info(f"Downloading transcript for: {video_metadata.get('title', video_id)}")
+        # Per-video messages are debug-level and lazily formatted; tqdm reports progress
+        logger.debug("Downloading transcript for: %s", video_metadata.get('title') or video_id)
         
         try:
-            # Set output template for this specific video
-            ydl_opts = self.ydl_opts.copy()
-            ydl_opts['outtmpl'] = str(self.output_dir / f'{video_id}.%(ext)s')
+            info = self._get_ydl().extract_info(video_url, download=True)
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(video_url, download=True)
-                
-                # Find the downloaded transcript file
-                transcript_path = self.output_dir / f"{video_id}.en.vtt"
-                if not transcript_path.exists():
-                    # Try without .en suffix
-                    transcript_path = self.output_dir / f"{video_id}.vtt"
+            # yt-dlp reports where it wrote the transcript
+            transcript_path = downloaded_subtitle_path(info)
+            success = transcript_path is not None
+            
+            result = {
+                'video_id': video_id,
+                'title': info.get('title'),
+                'duration': info.get('duration'),
+                'transcript_path': str(transcript_path) if transcript_path else None,
+                'gcs_transcript_path': None,
+                'success': success
+            }
+            
+            if success:
+                # Upload to GCS if configured
+                if self.upload_to_gcs and self.gcs_storage:
+                    if self._upload_executor:
+                        # Upload in the background so this worker can start its next download
+                        self._upload_executor.submit(self._upload_transcript, transcript_path, result)
+                    else:
+                        self._upload_transcript(transcript_path, result)
+                else:
+                    self._record_result(result)
                 
-                result = {
-                    'video_id': video_id,
-                    'title': info.get('title'),
-                    'duration': info.get('duration'),
-                    'transcript_path': str(transcript_path) if transcript_path.exists() else None,
-                    'gcs_transcript_path': None,
-                    'success': transcript_path.exists()
-                }
+                return result
+            else:
+                logger.warning(f"Transcript file not found for {video_id}")
+                return result
                 
-                if transcript_path.exists():
-                    # Upload to GCS if configured
-                    if self.upload_to_gcs and self.gcs_storage:
-                        gcs_path = f"transcripts/{video_id}.vtt"
-                        if self.gcs_storage.upload_file(transcript_path, gcs_path, 
-                                                       content_type='text/vtt',
-                                                       metadata={'title': result['title']}):
-                            result['gcs_transcript_path'] = gcs_path
-                            # Delete local file after upload
-                            transcript_path.unlink()
-                            logger.info(f"Uploaded and deleted local transcript: {video_id}")
-                    
-                    return result
-                else:
-                    logger.warning(f"Transcript file not found for {video_id}")
-                    return result
-                    
         except Exception as e:
             logger.error(f"Failed to download transcript for {video_id}: {e}")
             return {
@@ -125,6 +179,173 @@ class TranscriptDownloader:
                 'error': str(e)
             }
     
+    def _upload_transcript(self, transcript_path: Path, result: dict):
+        """
+        Upload a downloaded transcript and its plain text to GCS, then delete the local copy.
+        
+        The text is extracted from the bytes already read for the upload, so
+        the file does not need a second read and parse by TranscriptProcessor.
+        
+        Args:
+            transcript_path: Local .vtt file
+            result: Result dictionary for the video, updated with the GCS paths
+        """
+        video_id = result['video_id']
+        gcs_path = f"transcripts/{video_id}.vtt"
+        data = transcript_path.read_bytes()
+        if self.gcs_storage.upload_string(data, gcs_path, content_type='text/vtt',
+                                          metadata={'title': result['title']}):
+            result['gcs_transcript_path'] = gcs_path
+            
+            text_path = f"transcripts/processed/{video_id}_transcript.txt"
+            if self.gcs_storage.upload_string(vtt_to_text(data), text_path, content_type='text/plain'):
+                result['gcs_text_path'] = text_path
+            # Delete local file after upload
+            self._delete_queue.put(transcript_path)
+            logger.debug("Uploaded transcript: %s", video_id)
+            self._record_result(result)
+    
+    def _delete_uploaded(self):
+        """Janitor thread: delete local transcripts once they are in GCS."""
+        while True:
+            path = self._delete_queue.get()
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not delete {path}: {e}")
+            finally:
+                self._delete_queue.task_done()
+    
+    def _record_result(self, result: dict):
+        """
+        Append a finished result to the NDJSON results log, if one is open.
+        
+        Args:
+            result: Result dictionary for a fully downloaded (and uploaded) transcript
+        """
+        if self._results_log is None:
+            return
+        line = fast_json.dumps(result) + b'\n'
+        with self._results_log_lock:
+            self._results_log.write(line)
+            self._results_log.flush()
+    
+    def _completed_ids(self, results_log: Optional[Path] = None) -> set:
+        """
+        Collect the video ids whose transcripts are already done.
+        
+        Reads the NDJSON results log if there is one and, when uploading,
+        lists transcripts/ in the bucket once instead of probing per video.
+        
+        Args:
+            results_log: Optional NDJSON results log from a previous run
+            
+        Returns:
+            Set of completed video ids
+        """
+        done = set()
+        if results_log and results_log.exists():
+            with open(results_log, 'rb') as f:
+                done.update(fast_json.loads(line)['video_id'] for line in f if line.strip())
+        
+        if self.upload_to_gcs and self.gcs_storage:
+            for name in self.gcs_storage.list_files("transcripts/"):
+                filename = name[len("transcripts/"):]
+                if '/' not in filename and filename.endswith('.vtt'):
+                    done.add(filename[:-len('.vtt')])
+        
+        return done
+    
+    def download_many(self, video_metas, total=None, results_log: Optional[Path] = None):
+        """
+        Download transcripts for many videos concurrently.
+        
+        Only a few videos per worker are in flight at once, so video_metas
+        can be a lazy stream of any length. Only the most recent results are
+        kept in memory; with results_log every finished result is appended to
+        an NDJSON file instead. Videos already listed there, or already in the
+        bucket when uploading to GCS, are skipped.
+        
+        Args:
+            video_metas: Iterable of video metadata dictionaries
+            total: Number of videos, for the progress bar
+            results_log: Optional NDJSON file used to record and resume progress
+            
+        Returns:
+            Tuple of (number of successful downloads, up to the last 100 results,
+            metadata of failed videos)
+        """
+        successful = 0
+        results = deque(maxlen=100)
+        failed = []
+        
+        # Resolve each video's ID and URL once, up front, instead of in every worker
+        videos = (
+            (video_meta.get('youtube_id') or video_meta.get('id'), video_meta)
+            for video_meta in video_metas
+        )
+        done = self._completed_ids(results_log)
+        if done:
+            logger.info(f"Resuming: skipping {len(done)} transcripts that are already done")
+            videos = ((youtube_id, video_meta) for youtube_id, video_meta in videos
+                      if youtube_id not in done)
+        if results_log:
+            self._results_log = open(results_log, 'ab')
+        
+        def download(youtube_id, video_url, video_meta):
+            self.rate_limiter.acquire()
+            result = self.download_transcript(youtube_id, video_url, video_meta)
+            if result['success']:
+                self.rate_limiter.succeeded()
+            elif '429' in result.get('error', ''):
+                self.rate_limiter.throttled()
+            return video_meta, result
+        
+        def collect(future):
+            nonlocal successful
+            video_meta, result = future.result()
+            if result['success']:
+                successful += 1
+                results.append(result)
+            else:
+                failed.append(video_meta)
+            progress.update()
+        
+        if self.upload_to_gcs and self.gcs_storage:
+            self._upload_executor = ThreadPoolExecutor(max_workers=self.upload_workers)
+        
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor, \
+                    tqdm(total=total, desc="Downloading transcripts") as progress:
+                in_flight = deque()
+                for youtube_id, video_meta in videos:
+                    if not youtube_id:
+                        logger.warning(f"No YouTube ID found for video: {video_meta}")
+                        failed.append(video_meta)
+                        progress.update()
+                        continue
+                    video_url = f"https://www.youtube.com/watch?v={youtube_id}"
+                    in_flight.append(executor.submit(download, youtube_id, video_url, video_meta))
+                    if len(in_flight) >= self.workers * 2:
+                        collect(in_flight.popleft())
+                while in_flight:
+                    collect(in_flight.popleft())
+        finally:
+            # Wait for queued uploads so results carry their GCS paths
+            if self._upload_executor:
+                self._upload_executor.shutdown(wait=True)
+                self._upload_executor = None
+            self._delete_queue.join()
+            if self._results_log:
+                self._results_log.close()
+                self._results_log = None
+        
+        # The worker threads are gone, so release their YoutubeDL instances
+        self.close()
+        return successful, list(results), failed
+    
     def download_from_catalog(self, catalog_path: Path, max_videos=None):
         """
         Download transcripts from catalog.
@@ -132,6 +353,10 @@ class TranscriptDownloader:
         Args:
             catalog_path: Path to video catalog JSON
             max_videos: Maximum number of videos to process
+            
+        Returns:
+            Tuple of (number of successful downloads, up to the last 100 results,
+            metadata of failed videos)
         """
         logger.info(f"Loading catalog from {catalog_path}")
         
@@ -144,57 +369,33 @@ class TranscriptDownloader:
                 self.gcs_storage.download_file(gcs_path, local_catalog)
                 catalog_path = local_catalog
         
-        with open(catalog_path, 'r', encoding='utf-8') as f:
-            catalog = json.load(f)
-        
-        if not isinstance(catalog, list):
-            catalog = [catalog]
-        
-        if max_videos:
-            catalog = catalog[:max_videos]
-        
-        results = []
-        failed = []
-        
-        logger.info(f"Starting transcript download for {len(catalog)} videos...")
-        
-        for video_meta in tqdm(catalog, desc="Downloading transcripts"):
-            youtube_id = video_meta.get('youtube_id') or video_meta.get('id')
-            if not youtube_id:
-                logger.warning(f"No YouTube ID found for video: {video_meta}")
-                failed.append(video_meta)
-                continue
-            
-            video_url = f"https://www.youtube.com/watch?v={youtube_id}"
-            result = self.download_transcript(video_url, video_meta)
-            
-            if result.get('success'):
-                results.append(result)
-            else:
-                failed.append(video_meta)
-            
-            # Rate limiting
-            time.sleep(0.5)  # Faster for transcripts only
+        # Stream the catalog so downloads start before it has been fully parsed;
+        # each finished transcript is logged so an interrupted run can resume
+        logger.info("Starting transcript download...")
+        successful, results, failed = self.download_many(
+            iter_catalog(catalog_path, max_videos), total=max_videos,
+            results_log=self.output_dir / "transcript_download_results.ndjson"
+        )
         
         # Save results
         results_data = {
-            'successful': len(results),
+            'successful': successful,
             'failed': len(failed),
-            'total': len(catalog),
-            'results': results[:100]  # First 100 for reference
+            'total': successful + len(failed),
+            'results': results  # Last 100 for reference
         }
         
         # Save locally
         results_path = self.output_dir / "transcript_download_results.json"
-        with open(results_path, 'w', encoding='utf-8') as f:
-            json.dump(results_data, f, indent=2, ensure_ascii=False)
+        with open(results_path, 'wb') as f:
+            f.write(fast_json.dumps(results_data, indent=True))
         
         # Upload to GCS if configured
         if self.upload_to_gcs and self.gcs_storage:
             self.gcs_storage.upload_json(results_data, "metadata/transcript_download_results.json")
         
-        logger.info(f"Transcript download complete: {len(results)} successful, {len(failed)} failed")
-        return results, failed
+        logger.info(f"Transcript download complete: {successful} successful, {len(failed)} failed")
+        return successful, results, failed
 
 
 def main():
@@ -214,9 +415,23 @@ def main():
                        help="Maximum number of transcripts to download")
     parser.add_argument("--discover-first", action="store_true",
                        help="Discover all videos first, then download transcripts (NOTE: API removed, may not work)")
+    parser.add_argument("--workers", type=int, default=8,
+                       help="Number of transcripts to download concurrently")
+    parser.add_argument("--rate-limit", type=float, default=0.1,
+                       help="Minimum average delay between downloads across all workers, in seconds")
     
     args = parser.parse_args()
+    run(args)
+
+
+def run(args: argparse.Namespace):
+    """
+    Download transcripts for a catalog or a list of YouTube IDs.
     
+    Args:
+        args: Parsed arguments (catalog, youtube_ids, gcs_bucket, gcs_credentials,
+              output_dir, max, discover_first, workers, rate_limit)
+    """
     # Setup GCS if configured
     gcs_storage = None
     upload_to_gcs = False
@@ -270,37 +485,32 @@ def main():
         downloader = TranscriptDownloader(
             gcs_storage=gcs_storage,
             upload_to_gcs=upload_to_gcs,
-            output_dir=args.output_dir
+            output_dir=args.output_dir,
+            workers=args.workers,
+            rate_limit=args.rate_limit
         )
         
         youtube_ids = [vid.strip() for vid in args.youtube_ids.split(',')]
         if args.max:
             youtube_ids = youtube_ids[:args.max]
         
-        results = []
-        failed = []
-        for youtube_id in youtube_ids:
-            video_url = f"https://www.youtube.com/watch?v={youtube_id}"
-            video_meta = {'youtube_id': youtube_id, 'id': youtube_id, 'title': f'Video {youtube_id}'}
-            result = downloader.download_transcript(video_url, video_meta)
-            if result.get('success'):
-                results.append(result)
-            else:
-                failed.append(video_meta)
-            time.sleep(0.5)  # Rate limiting
-        
-        logger.info(f"Complete! Downloaded {len(results)} transcripts, {len(failed)} failed")
+        video_metas = [
+            {'youtube_id': youtube_id, 'id': youtube_id, 'title': f'Video {youtube_id}'}
+            for youtube_id in youtube_ids
+        ]
+        successful, results, failed = downloader.download_many(video_metas, total=len(video_metas))
     elif args.catalog.exists() or upload_to_gcs:
         # Download from catalog
         logger.info("Starting transcript download from catalog...")
         downloader = TranscriptDownloader(
             gcs_storage=gcs_storage,
             upload_to_gcs=upload_to_gcs,
-            output_dir=args.output_dir
+            output_dir=args.output_dir,
+            workers=args.workers,
+            rate_limit=args.rate_limit
         )
         
-        results, failed = downloader.download_from_catalog(args.catalog, max_videos=args.max)
-        logger.info(f"Complete! Downloaded {len(results)} transcripts, {len(failed)} failed")
+        successful, results, failed = downloader.download_from_catalog(args.catalog, max_videos=args.max)
     else:
         logger.error(f"Catalog file not found: {args.catalog}")
         logger.info("Options:")
@@ -309,7 +519,7 @@ def main():
         logger.info("  3. Provide a valid catalog file path with --catalog")
         return
     
-    logger.info(f"Complete! Downloaded {len(results)} transcripts, {len(failed)} failed")
+    logger.info(f"Complete! Downloaded {successful} transcripts, {len(failed)} failed")
     
     # Process transcripts if we have them locally
     if not upload_to_gcs or args.output_dir:
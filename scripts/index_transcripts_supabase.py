@@ -17,11 +17,22 @@ sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
 from storage.supabase_storage import SupabaseStorage
 from process.process_transcripts import TranscriptProcessor
+from utils import fast_json
+from utils.catalog import iter_catalog
 import logging
 import argparse
-import json
 import os
-from typing import List, Dict, Any
+import re
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+try:
+    import numba
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    numba = None
 
 logging.basicConfig(
     level=logging.INFO,
@@ -30,70 +41,164 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+EMBEDDING_MODEL = "text-embedding-ada-002"
+# Inputs per embeddings request; chunks are ~1000 characters, far below the
+# model's 8191-token per-input limit
+EMBEDDING_BATCH_SIZE = 96
+# Embedding requests in flight at once for a single transcript
+EMBEDDING_CONCURRENCY = 5
+# Catalog fields that map onto khan_videos columns
+VIDEO_COLUMNS = ('title', 'description', 'duration_seconds', 'khan_topic', 'khan_subject',
+                 'khan_course', 'url', 'thumbnail_url', 'metadata')
+# Transcripts written to Supabase per set of bulk requests
+INDEX_BATCH_SIZE = 100
+# Batches written to Supabase at once
+INDEX_WRITE_WORKERS = 4
+# Suffixes added to the YouTube ID in transcript file names
+TRANSCRIPT_STEM_SUFFIX_RE = re.compile(r'_(?:transcript|text)$')
 
-def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[Dict[str, Any]]:
+
+def _chunk_boundaries(word_lens: Sequence[int], chunk_size: int, overlap_words: int) -> List[Tuple[int, int]]:
     """
-    Split text into chunks for embedding.
+    Compute the [start, end) word range of each chunk.
     
     Args:
-        text: Full text to chunk
+        word_lens: Length of each word plus its separating space
         chunk_size: Target chunk size in characters
-        overlap: Overlap between chunks in characters
+        overlap_words: Number of trailing words carried into the next chunk
     
     Returns:
-        List of chunk dictionaries
+        List of (start, end) word index pairs
     """
-    chunks = []
-    words = text.split()
-    current_chunk = []
+    boundaries = []
+    
+    # Slide a [start, end) window over the words, adjusting its length as
+    # words enter and leave instead of re-summing the overlap each chunk
+    start = 0
     current_length = 0
-    chunk_index = 0
-    
-    for word in words:
-        word_length = len(word) + 1  # +1 for space
-        if current_length + word_length > chunk_size and current_chunk:
-            # Save current chunk
-            chunk_text = ' '.join(current_chunk)
-            chunks.append({
-                'chunk_text': chunk_text,
-                'chunk_index': chunk_index,
-                'start_time_seconds': None,  # Could parse from VTT if available
-                'end_time_seconds': None,
-                'metadata': {}
-            })
-            chunk_index += 1
+    for end in range(len(word_lens)):
+        word_length = word_lens[end]
+        if current_length + word_length > chunk_size and end > start:
+            boundaries.append((start, end))
             
             # Start new chunk with overlap
-            overlap_words = int(overlap / 10)  # Rough word count for overlap
-            current_chunk = current_chunk[-overlap_words:] if len(current_chunk) > overlap_words else current_chunk
-            current_length = sum(len(w) + 1 for w in current_chunk)
+            if end - start > overlap_words:
+                new_start = end - overlap_words
+                for i in range(start, new_start):
+                    current_length -= word_lens[i]
+                start = new_start
         
-        current_chunk.append(word)
         current_length += word_length
     
     # Add final chunk
-    if current_chunk:
-        chunks.append({
-            'chunk_text': ' '.join(current_chunk),
+    if start < len(word_lens):
+        boundaries.append((start, len(word_lens)))
+    
+    return boundaries
+
+
+def _chunk_boundaries_bisect(word_lens: Sequence[int], chunk_size: int,
+                             overlap_words: int) -> List[Tuple[int, int]]:
+    """
+    Compute the same boundaries as _chunk_boundaries from a prefix sum.
+    
+    Each chunk end is found with a binary search over the cumulative word
+    lengths, so Python-level work is per chunk rather than per word.
+    
+    Args:
+        word_lens: Length of each word plus its separating space
+        chunk_size: Target chunk size in characters
+        overlap_words: Number of trailing words carried into the next chunk
+    
+    Returns:
+        List of (start, end) word index pairs
+    """
+    # offsets[i] is the combined length of the first i words
+    offsets = [0, *accumulate(word_lens)]
+    boundaries = []
+    start = 0
+    end = 0
+    while True:
+        # First word that would push the chunk past chunk_size; once a chunk
+        # overflows, each following word overflows too until start moves
+        end = max(bisect_right(offsets, offsets[start] + chunk_size) - 1, start + 1, end + 1)
+        if end >= len(word_lens):
+            break
+        boundaries.append((start, end))
+        if end - start > overlap_words:
+            start = end - overlap_words
+    
+    if start < len(word_lens):
+        boundaries.append((start, len(word_lens)))
+    
+    return boundaries
+
+
+if numba is not None:
+    # The boundary scan is pure integer arithmetic, so compile it when numba is available
+    _chunk_boundaries = numba.njit(cache=True)(_chunk_boundaries)
+else:
+    _chunk_boundaries = _chunk_boundaries_bisect
+
+
+def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[Dict[str, Any]]:
+    """
+    Split text into chunks for embedding.
+    
+    Args:
+        text: Full text to chunk
+        chunk_size: Target chunk size in characters
+        overlap: Overlap between chunks in characters
+    
+    Returns:
+        List of chunk dictionaries
+    """
+    return chunk_words(text.split(), chunk_size, overlap)
+
+
+def chunk_words(words: List[str], chunk_size: int = 1000, overlap: int = 200) -> List[Dict[str, Any]]:
+    """
+    Split already-tokenized text into chunks for embedding.
+    
+    Args:
+        words: Whitespace-separated words of the text
+        chunk_size: Target chunk size in characters
+        overlap: Overlap between chunks in characters
+    
+    Returns:
+        List of chunk dictionaries
+    """
+    overlap_words = int(overlap / 10)  # Rough word count for overlap
+    if numba is not None:
+        word_lens = np.fromiter((len(word) + 1 for word in words), dtype=np.int64, count=len(words))
+    else:
+        word_lens = [len(word) + 1 for word in words]  # +1 for space
+    
+    return [
+        {
+            'chunk_text': ' '.join(words[start:end]),
             'chunk_index': chunk_index,
-            'start_time_seconds': None,
+            'start_time_seconds': None,  # Could parse from VTT if available
             'end_time_seconds': None,
             'metadata': {}
-        })
-    
-    return chunks
+        }
+        for chunk_index, (start, end) in enumerate(_chunk_boundaries(word_lens, chunk_size, overlap_words))
+    ]
 
 
-def generate_embedding(text: str, api_key: Optional[str] = None) -> Optional[List[float]]:
+def generate_embeddings_batch(texts: List[str], api_key: Optional[str] = None) -> List[Optional[List[float]]]:
     """
-    Generate embedding for text using OpenAI API.
+    Generate embeddings for several texts using the OpenAI API.
+    
+    Texts are sent in slices of EMBEDDING_BATCH_SIZE, one request per slice,
+    instead of one request per text. Slices are requested concurrently.
     
     Args:
-        text: Text to embed
+        texts: Texts to embed
         api_key: OpenAI API key (or use OPENAI_API_KEY env var)
     
     Returns:
-        Embedding vector (1536 dimensions) or None
+        Embedding vectors (1536 dimensions) in input order, or Nones on failure
     """
     try:
         import openai
@@ -101,41 +206,62 @@ def generate_embedding(text: str, api_key: Optional[str] = None) -> Optional[Lis
         api_key = api_key or os.environ.get('OPENAI_API_KEY')
         if not api_key:
             logger.warning("OpenAI API key not found. Skipping embedding generation.")
-            return None
+            return [None] * len(texts)
         
         client = openai.OpenAI(api_key=api_key)
-        response = client.embeddings.create(
-            model="text-embedding-ada-002",
-            input=text
-        )
-        return response.data[0].embedding
+        
+        def embed(batch: List[str]) -> List[List[float]]:
+            response = client.embeddings.create(model=EMBEDDING_MODEL, input=batch)
+            return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+        
+        batches = [texts[start:start + EMBEDDING_BATCH_SIZE]
+                   for start in range(0, len(texts), EMBEDDING_BATCH_SIZE)]
+        if len(batches) <= 1:
+            return [embedding for batch in batches for embedding in embed(batch)]
+        
+        # executor.map keeps the slices in input order
+        with ThreadPoolExecutor(max_workers=min(EMBEDDING_CONCURRENCY, len(batches))) as executor:
+            return [embedding for result in executor.map(embed, batches) for embedding in result]
     except ImportError:
         logger.warning("openai package not installed. Install with: pip install openai")
-        return None
+        return [None] * len(texts)
     except Exception as e:
-        logger.error(f"Failed to generate embedding: {e}")
-        return None
+        logger.error(f"Failed to generate embeddings: {e}")
+        return [None] * len(texts)
 
 
-def index_transcript_file(transcript_path: Path, supabase: SupabaseStorage, 
-                         video_metadata: Dict[str, Any], generate_embeddings: bool = False) -> bool:
+def generate_embedding(text: str, api_key: Optional[str] = None) -> Optional[List[float]]:
     """
-    Index a single transcript file in Supabase.
+    Generate embedding for text using OpenAI API.
+    
+    Args:
+        text: Text to embed
+        api_key: OpenAI API key (or use OPENAI_API_KEY env var)
+    
+    Returns:
+        Embedding vector (1536 dimensions) or None
+    """
+    return generate_embeddings_batch([text], api_key)[0]
+
+
+def prepare_transcript(transcript_path: Path, video_metadata: Dict[str, Any],
+                       generate_embeddings: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Read, chunk and optionally embed a transcript file without touching Supabase.
     
     Args:
         transcript_path: Path to transcript file (.txt or .json)
-        supabase: Supabase storage instance
         video_metadata: Video metadata dictionary
         generate_embeddings: Whether to generate embeddings for chunks
     
     Returns:
-        True if successful, False otherwise
+        Dictionary with 'video', 'transcript' and 'chunks' entries, or None
     """
     try:
         # Read transcript
         if transcript_path.suffix == '.json':
-            with open(transcript_path, 'r', encoding='utf-8') as f:
-                transcript_data = json.load(f)
+            with open(transcript_path, 'rb') as f:
+                transcript_data = fast_json.loads(f.read())
                 full_text = transcript_data.get('text', '')
                 raw_vtt = transcript_data.get('raw_vtt', '')
         else:
@@ -145,48 +271,101 @@ def index_transcript_file(transcript_path: Path, supabase: SupabaseStorage,
         
         if not full_text:
             logger.warning(f"Empty transcript: {transcript_path}")
-            return False
-        
-        # Upsert video
-        video_id = supabase.upsert_video(video_metadata)
-        if not video_id:
-            logger.error(f"Failed to upsert video: {video_metadata.get('youtube_id')}")
-            return False
+            return None
         
-        # Upsert transcript
-        transcript_data = {
-            'video_id': video_id,
-            'youtube_id': video_metadata['youtube_id'],
-            'full_text': full_text,
-            'raw_vtt': raw_vtt,
-            'word_count': len(full_text.split()),
-            'metadata': {}
-        }
-        transcript_id = supabase.upsert_transcript(transcript_data)
-        if not transcript_id:
-            logger.error(f"Failed to upsert transcript for video: {video_metadata.get('youtube_id')}")
-            return False
+        # Split once; the words give both the word count and the chunks
+        words = full_text.split()
         
         # Chunk transcript
-        chunks = chunk_text(full_text)
-        logger.info(f"Created {len(chunks)} chunks for transcript {transcript_id}")
+        chunks = chunk_words(words)
+        logger.info(f"Created {len(chunks)} chunks for video {video_metadata.get('youtube_id')}")
         
         # Generate embeddings if requested
         if generate_embeddings:
             logger.info("Generating embeddings...")
-            for chunk in chunks:
-                embedding = generate_embedding(chunk['chunk_text'])
+            embeddings = generate_embeddings_batch([chunk['chunk_text'] for chunk in chunks])
+            for chunk, embedding in zip(chunks, embeddings):
                 if embedding:
                     chunk['embedding'] = embedding
         
-        # Upsert chunks
-        chunk_count = supabase.upsert_chunks(chunks, transcript_id, video_id)
-        logger.info(f"Indexed {chunk_count} chunks for video {video_metadata.get('youtube_id')}")
-        
-        return True
+        return {
+            'video': video_metadata,
+            'transcript': {
+                'youtube_id': video_metadata['youtube_id'],
+                'full_text': full_text,
+                'raw_vtt': raw_vtt,
+                'word_count': len(words),
+                'metadata': {}
+            },
+            'chunks': chunks,
+        }
     except Exception as e:
-        logger.error(f"Failed to index transcript {transcript_path}: {e}")
-        return False
+        logger.error(f"Failed to prepare transcript {transcript_path}: {e}")
+        return None
+
+
+def index_prepared_batch(supabase: SupabaseStorage, prepared: List[Dict[str, Any]]) -> int:
+    """
+    Write prepared transcripts to Supabase with one set of bulk requests.
+    
+    Args:
+        supabase: Supabase storage instance
+        prepared: Results of prepare_transcript
+    
+    Returns:
+        Number of transcripts fully indexed
+    """
+    # A bulk upsert cannot touch the same row twice, so keep the last
+    # transcript per video (e.g. when both a .txt and a .json exist)
+    prepared = list({item['video']['youtube_id']: item for item in prepared}.values())
+    
+    # Upsert videos; PostgREST rejects bulk rows with differing keys, and
+    # catalogued and uncatalogued videos carry different metadata, so fill
+    # the missing columns with None
+    columns = {column for item in prepared for column in item['video']}
+    video_ids = supabase.upsert_videos_bulk([{**dict.fromkeys(columns), **item['video']} for item in prepared])
+    
+    # Upsert transcripts, keeping each alongside its item so skipped videos
+    # can't shift later chunks onto the wrong transcript
+    pairs = []
+    for item in prepared:
+        video_id = video_ids.get(item['video']['youtube_id'])
+        if not video_id:
+            logger.error(f"Failed to upsert video: {item['video']['youtube_id']}")
+            continue
+        pairs.append((item, dict(item['transcript'], video_id=video_id)))
+    transcript_ids = supabase.upsert_transcripts_bulk([transcript for _, transcript in pairs])
+    
+    # Upsert chunks
+    chunk_batches = []
+    for item, transcript in pairs:
+        transcript_id = transcript_ids.get(transcript['video_id'])
+        if not transcript_id:
+            logger.error(f"Failed to upsert transcript for video: {transcript['youtube_id']}")
+            continue
+        chunk_batches.append((item['chunks'], transcript_id, transcript['video_id']))
+    chunk_count = supabase.upsert_chunks_bulk(chunk_batches)
+    logger.info(f"Indexed {chunk_count} chunks for {len(chunk_batches)} videos")
+    
+    return len(chunk_batches)
+
+
+def index_transcript_file(transcript_path: Path, supabase: SupabaseStorage, 
+                         video_metadata: Dict[str, Any], generate_embeddings: bool = False) -> bool:
+    """
+    Index a single transcript file in Supabase.
+    
+    Args:
+        transcript_path: Path to transcript file (.txt or .json)
+        supabase: Supabase storage instance
+        video_metadata: Video metadata dictionary
+        generate_embeddings: Whether to generate embeddings for chunks
+    
+    Returns:
+        True if successful, False otherwise
+    """
+    prepared = prepare_transcript(transcript_path, video_metadata, generate_embeddings)
+    return prepared is not None and index_prepared_batch(supabase, [prepared]) == 1
 
 
 def main():
@@ -203,9 +382,21 @@ def main():
                        help="Generate embeddings for chunks (requires OpenAI API key)")
     parser.add_argument("--max", type=int, default=None,
                        help="Maximum number of transcripts to index")
+    parser.add_argument("--workers", type=int, default=8,
+                       help="Number of transcripts indexed concurrently")
     
     args = parser.parse_args()
+    run(args)
+
+
+def run(args: argparse.Namespace):
+    """
+    Index transcript files in Supabase.
     
+    Args:
+        args: Parsed arguments (transcripts_dir, catalog, supabase_url, supabase_key,
+              generate_embeddings, max, workers)
+    """
     # Initialize Supabase (will auto-load from Inquiry.Institute if not provided)
     try:
         supabase = SupabaseStorage(args.supabase_url, args.supabase_key)
@@ -218,47 +409,59 @@ def main():
     # Load catalog if provided
     catalog = {}
     if args.catalog and args.catalog.exists():
-        with open(args.catalog, 'r', encoding='utf-8') as f:
-            catalog_list = json.load(f)
-            # Index by youtube_id
-            for video in catalog_list:
-                youtube_id = video.get('youtube_id') or video.get('id')
-                if youtube_id:
-                    catalog[youtube_id] = video
-    
-    # Find transcript files
+        # Stream the catalog and index by youtube_id, keeping only the fields
+        # stored on khan_videos (others such as tags would be rejected by the upsert)
+        catalog = {
+            youtube_id: dict({column: video[column] for column in VIDEO_COLUMNS if column in video},
+                             youtube_id=youtube_id)
+            for video in iter_catalog(args.catalog)
+            if (youtube_id := video.get('youtube_id') or video.get('id'))
+        }
+    
+    # Find transcript files in a single walk (each file is listed once)
     transcript_files = []
-    for ext in ['.txt', '.json']:
-        transcript_files.extend(args.transcripts_dir.glob(f'*{ext}'))
-        transcript_files.extend(args.transcripts_dir.glob(f'**/*{ext}'))
+    for root, _, files in os.walk(args.transcripts_dir):
+        transcript_files.extend(Path(root) / name for name in files if name.endswith(('.txt', '.json')))
     
     if args.max:
         transcript_files = transcript_files[:args.max]
     
     logger.info(f"Found {len(transcript_files)} transcript files")
     
-    # Index each transcript
-    successful = 0
-    failed = 0
-    
-    for transcript_file in transcript_files:
+    def prepare(transcript_file: Path) -> Optional[Dict[str, Any]]:
         # Try to extract YouTube ID from filename
-        youtube_id = transcript_file.stem.replace('_transcript', '').replace('_text', '')
-        
-        # Get metadata from catalog
-        video_metadata = catalog.get(youtube_id, {
-            'youtube_id': youtube_id,
-            'title': None,
-            'description': None,
-        })
+        youtube_id = TRANSCRIPT_STEM_SUFFIX_RE.sub('', transcript_file.stem)
         
-        # Ensure youtube_id is set
-        video_metadata['youtube_id'] = youtube_id
+        # Get metadata from catalog (entries already carry their youtube_id)
+        video_metadata = catalog.get(youtube_id)
+        if video_metadata is None:
+            video_metadata = {
+                'youtube_id': youtube_id,
+                'title': None,
+                'description': None,
+            }
         
-        if index_transcript_file(transcript_file, supabase, video_metadata, args.generate_embeddings):
-            successful += 1
-        else:
-            failed += 1
+        return prepare_transcript(transcript_file, video_metadata, args.generate_embeddings)
+    
+    # Prepare transcripts concurrently (reading, chunking and OpenAI round
+    # trips overlap), then write them to Supabase in bulk batches. Batches are
+    # written in the background so Supabase round trips overlap with each
+    # other and with preparing the next batch
+    writes = []
+    pending = []
+    with ThreadPoolExecutor(max_workers=INDEX_WRITE_WORKERS) as writer:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            for prepared in executor.map(prepare, transcript_files):
+                if prepared is None:
+                    continue
+                pending.append(prepared)
+                if len(pending) >= INDEX_BATCH_SIZE:
+                    writes.append(writer.submit(index_prepared_batch, supabase, pending))
+                    pending = []
+        if pending:
+            writes.append(writer.submit(index_prepared_batch, supabase, pending))
+    successful = sum(write.result() for write in writes)
+    failed = len(transcript_files) - successful
     
     logger.info(f"Indexing complete: {successful} successful, {failed} failed")
 
@@ -6,14 +6,14 @@ Lists available channels, content nodes, and generates course metadata.
 """
 
 import sys
-import json
 from pathlib import Path
 from typing import Dict, List
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
-from api.kolibri_client import KolibriClient
+from api.kolibri_client import KolibriClient, is_subtitle_file
+from utils import fast_json
 import argparse
 import logging
 
@@ -62,9 +62,9 @@ def discover_khan_academy_content(kolibri_url: str = "http://localhost:8080",
     # Organize by topic/subject
     courses = {}
     
-    for video in videos:
-        # Get full details
-        details = client.get_content_node_details(video['id'])
+    # Details and file lists are fetched concurrently, in video order
+    video_details = client.get_video_details(videos)
+    for video, (details, files) in zip(videos, video_details):
         if not details:
             continue
         
@@ -79,7 +79,6 @@ def discover_khan_academy_content(kolibri_url: str = "http://localhost:8080",
             }
         
         # Get file URLs
-        files = client.get_content_files(video['id'])
         video_url = None
         transcript_url = None
         
@@ -87,7 +86,7 @@ def discover_khan_academy_content(kolibri_url: str = "http://localhost:8080",
             preset = file_info.get('preset', '').lower()
             if preset == 'high_res_video' or preset == 'video':
                 video_url = file_info.get('storage_url') or file_info.get('url')
-            elif 'subtitle' in preset or 'transcript' in preset:
+            elif is_subtitle_file(file_info):
                 transcript_url = file_info.get('storage_url') or file_info.get('url')
         
         video_metadata = {
@@ -112,15 +111,15 @@ def discover_khan_academy_content(kolibri_url: str = "http://localhost:8080",
         
         # Save full catalog
         catalog_path = output_dir / 'kolibri_khan_academy_catalog.json'
-        with open(catalog_path, 'w') as f:
-            json.dump(list(courses.values()), f, indent=2)
+        with open(catalog_path, 'wb') as f:
+            f.write(fast_json.dumps(list(courses.values()), indent=True))
         logger.info(f"Saved catalog to {catalog_path}")
         
         # Save per-subject
         for subject, course_data in courses.items():
             subject_path = output_dir / f"{subject.replace(' ', '_').lower()}_catalog.json"
-            with open(subject_path, 'w') as f:
-                json.dump(course_data, f, indent=2)
+            with open(subject_path, 'wb') as f:
+                f.write(fast_json.dumps(course_data, indent=True))
     
     return list(courses.values())
 
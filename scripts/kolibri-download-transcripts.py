@@ -7,6 +7,8 @@ Downloads transcripts and converts them to dialogic format.
 
 import sys
 import json
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import argparse
 import logging
@@ -14,7 +16,7 @@ import logging
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
-from api.kolibri_client import KolibriClient
+from api.kolibri_client import KolibriClient, MAX_WORKERS, is_subtitle_file
 from process.process_transcripts import TranscriptProcessor
 
 logging.basicConfig(level=logging.INFO)
@@ -68,62 +70,75 @@ def download_transcripts_from_kolibri(
     raw_dir.mkdir(parents=True, exist_ok=True)
     processed_dir.mkdir(parents=True, exist_ok=True)
     
+    # Build the processor and load the dialogic converter once for all videos;
+    # vtt-to-dialogic.py is not importable by name because of the hyphens
+    processor = TranscriptProcessor(raw_dir, processed_dir)
+    spec = importlib.util.spec_from_file_location('vtt_to_dialogic', Path(__file__).parent / 'vtt-to-dialogic.py')
+    vtt_to_dialogic_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(vtt_to_dialogic_module)
+    vtt_to_dialogic = vtt_to_dialogic_module.vtt_to_dialogic
+    
+    def fetch(video):
+        # Network half of the work: the transcript, plus the file list when
+        # the transcript is not already VTT
+        transcript_text = client.get_transcript(video['id'])
+        files = None
+        if transcript_text and not transcript_text.strip().startswith('WEBVTT'):
+            files = client.get_content_files(video['id'])
+        return transcript_text, files
+    
     # Process each video
     successful = 0
     failed = 0
     
-    for i, video in enumerate(videos, 1):
-        video_id = video['id']
-        title = video.get('title', 'Unknown')
-        
-        logger.info(f"[{i}/{len(videos)}] Processing: {title}")
-        
-        try:
-            # Get transcript
-            transcript_text = client.get_transcript(video_id)
+    # Fetch transcripts concurrently; executor.map keeps video order so the
+    # writes and processing below stay sequential
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for i, (video, (transcript_text, files)) in enumerate(zip(videos, executor.map(fetch, videos)), 1):
+            video_id = video['id']
+            title = video.get('title', 'Unknown')
             
-            if not transcript_text:
-                logger.warning(f"  No transcript available for {title}")
-                failed += 1
-                continue
+            logger.info(f"[{i}/{len(videos)}] Processing: {title}")
             
-            # Save raw transcript (VTT format if available, or plain text)
-            transcript_path = raw_dir / f"{video_id}.vtt"
-            if not transcript_text.strip().startswith('WEBVTT'):
-                # If not VTT, try to get VTT file from files
-                files = client.get_content_files(video_id)
-                for file_info in files:
-                    preset = file_info.get('preset', '').lower()
-                    if 'subtitle' in preset or 'vtt' in preset:
-                        file_url = file_info.get('storage_url') or file_info.get('url')
-                        if file_url and client.download_file(file_url, transcript_path):
-                            break
+            try:
+                if not transcript_text:
+                    logger.warning(f"  No transcript available for {title}")
+                    failed += 1
+                    continue
+                
+                # Save raw transcript (VTT format if available, or plain text)
+                transcript_path = raw_dir / f"{video_id}.vtt"
+                if not transcript_text.strip().startswith('WEBVTT'):
+                    # If not VTT, try to get VTT file from files
+                    for file_info in files:
+                        if is_subtitle_file(file_info):
+                            file_url = file_info.get('storage_url') or file_info.get('url')
+                            if file_url and client.download_file(file_url, transcript_path):
+                                break
+                    else:
+                        # Save as plain text if no VTT found
+                        transcript_path = raw_dir / f"{video_id}.txt"
+                        transcript_path.write_bytes(transcript_text.encode('utf-8'))
                 else:
-                    # Save as plain text if no VTT found
-                    transcript_path = raw_dir / f"{video_id}.txt"
-                    transcript_path.write_text(transcript_text)
-            else:
-                transcript_path.write_text(transcript_text)
-            
-            # Process to dialogic format
-            processor = TranscriptProcessor(raw_dir, processed_dir)
-            result = processor.process_transcript(transcript_path, {
-                'title': title,
-                'id': video_id,
-                'source': 'kolibri'
-            })
-            
-            # Convert to dialogic format
-            from scripts.vtt_to_dialogic import vtt_to_dialogic
-            dialogic_path = processed_dir / f"{video_id}_dialogic_transcript.json"
-            vtt_to_dialogic(transcript_path, dialogic_path, video_id, title)
-            
-            logger.info(f"  ✅ Processed: {dialogic_path}")
-            successful += 1
-            
-        except Exception as e:
-            logger.error(f"  ❌ Failed to process {title}: {e}")
-            failed += 1
+                    transcript_path.write_bytes(transcript_text.encode('utf-8'))
+                
+                # Process to dialogic format
+                result = processor.process_transcript(transcript_path, {
+                    'title': title,
+                    'id': video_id,
+                    'source': 'kolibri'
+                })
+                
+                # Convert to dialogic format
+                dialogic_path = processed_dir / f"{video_id}_dialogic_transcript.json"
+                vtt_to_dialogic(transcript_path, dialogic_path, video_id, title)
+                
+                logger.info(f"  ✅ Processed: {dialogic_path}")
+                successful += 1
+                
+            except Exception as e:
+                logger.error(f"  ❌ Failed to process {title}: {e}")
+                failed += 1
     
     logger.info(f"\n✅ Completed: {successful} successful, {failed} failed")
 
@@ -8,7 +8,7 @@ import json
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
-from api.kolibri_client import KolibriClient
+from api.kolibri_client import KolibriClient, is_subtitle_file
 import argparse
 
 def main():
@@ -51,13 +51,11 @@ def main():
     
     print(f"\n📹 Found {len(videos)} videos:\n")
     
-    for i, video in enumerate(videos, 1):
-        details = client.get_content_node_details(video['id'])
+    video_details = client.get_video_details(videos, required_fields=('title', 'duration'))
+    for i, (video, (details, files)) in enumerate(zip(videos, video_details), 1):
         title = details.get('title', video.get('title', 'Unknown')) if details else video.get('title', 'Unknown')
         duration = details.get('duration', 0) if details else 0
-        files = client.get_content_files(video['id'])
-        has_transcript = any('subtitle' in f.get('preset', '').lower() or 'transcript' in f.get('preset', '').lower() 
-                           for f in files)
+        has_transcript = any(is_subtitle_file(f) for f in files)
         
         print(f"{i}. {title}")
         print(f"   ID: {video['id']}")
@@ -7,7 +7,7 @@ import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
-from api.kolibri_client import KolibriClient
+from api.kolibri_client import KolibriClient, is_subtitle_file
 import argparse
 
 def main():
@@ -47,12 +47,10 @@ def main():
         # Show sample videos
         if videos:
             print(f"\n📹 Sample videos (first 5):")
-            for i, video in enumerate(videos[:5], 1):
-                details = client.get_content_node_details(video['id'])
+            video_details = client.get_video_details(videos[:5], required_fields=('title',))
+            for i, (details, files) in enumerate(video_details, 1):
                 title = details.get('title', 'Unknown') if details else 'Unknown'
-                files = client.get_content_files(video['id'])
-                has_transcript = any('subtitle' in f.get('preset', '').lower() 
-                                   for f in files)
+                has_transcript = any(is_subtitle_file(f) for f in files)
                 print(f"   {i}. {title}")
                 print(f"      Transcript: {'✅' if has_transcript else '❌'}")
     else:
@@ -12,10 +12,12 @@ This script:
 
 import sys
 import argparse
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
-from api.kolibri_client import KolibriClient
+from api.kolibri_client import KolibriClient, MAX_WORKERS, is_subtitle_file
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
@@ -30,15 +32,22 @@ def find_kolibri_url():
         "http://127.0.0.1:8080",
     ]
     
-    for url in common_urls:
+    def probe(url):
         try:
-            client = KolibriClient(url)
-            if client.test_connection():
-                return url
+            return url if KolibriClient(url).test_connection(timeout=2) else None
         except:
-            continue
-    
-    return None
+            return None
+    
+    # Probe every candidate at once and take the first that answers, so
+    # unreachable hosts don't time out one after another
+    executor = ThreadPoolExecutor(max_workers=len(common_urls))
+    try:
+        for future in as_completed([executor.submit(probe, url) for url in common_urls]):
+            if future.result():
+                return future.result()
+        return None
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
 
 def main():
@@ -101,12 +110,12 @@ def main():
     if args.discover_only:
         # Just list what's available
         logger.info("\n📹 Sample videos:")
-        for i, video in enumerate(videos[:20], 1):
-            details = client.get_content_node_details(video['id'])
+        # Listed nodes usually carry their title already, so only the file
+        # lists need fetching; requests run concurrently, in video order
+        video_details = client.get_video_details(videos[:20], required_fields=('title',))
+        for i, (details, files) in enumerate(video_details, 1):
             title = details.get('title', 'Unknown') if details else 'Unknown'
-            files = client.get_content_files(video['id'])
-            has_transcript = any('subtitle' in f.get('preset', '').lower() 
-                               for f in files)
+            has_transcript = any(is_subtitle_file(f) for f in files)
             logger.info(f"   {i}. {title} {'✅' if has_transcript else '❌'}")
         return 0
     
@@ -125,23 +134,13 @@ def main():
     raw_dir.mkdir(parents=True, exist_ok=True)
     processed_dir.mkdir(parents=True, exist_ok=True)
     
-    successful = 0
-    failed = 0
-    
-    for i, video in enumerate(videos_to_download, 1):
+    def fetch(video):
+        # Network half of the work: get the transcript and save it to raw_dir
         video_id = video['id']
-        title = video.get('title', 'Unknown')
-        
-        logger.info(f"[{i}/{len(videos_to_download)}] {title}")
-        
         try:
-            # Get transcript
             transcript_text = client.get_transcript(video_id)
-            
             if not transcript_text:
-                logger.warning(f"  No transcript available")
-                failed += 1
-                continue
+                return None, None
             
             # Save transcript
             transcript_path = raw_dir / f"{video_id}.vtt"
@@ -149,41 +148,59 @@ def main():
                 # Try to get VTT file from files
                 files = client.get_content_files(video_id)
                 for file_info in files:
-                    preset = file_info.get('preset', '').lower()
-                    if 'subtitle' in preset or 'vtt' in preset:
+                    if is_subtitle_file(file_info):
                         file_url = file_info.get('storage_url') or file_info.get('url')
                         if file_url and client.download_file(file_url, transcript_path):
                             break
                 else:
                     transcript_path = raw_dir / f"{video_id}.txt"
-                    transcript_path.write_text(transcript_text)
+                    transcript_path.write_bytes(transcript_text.encode('utf-8'))
             else:
-                transcript_path.write_text(transcript_text)
+                transcript_path.write_bytes(transcript_text.encode('utf-8'))
+            return transcript_path, None
+        except Exception as e:
+            return None, e
+    
+    # Load the dialogic converter once and call it in-process instead of
+    # starting an interpreter per video; vtt-to-dialogic.py is not importable
+    # by name because of the hyphens
+    spec = importlib.util.spec_from_file_location('vtt_to_dialogic', Path(__file__).parent / 'vtt-to-dialogic.py')
+    vtt_to_dialogic_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(vtt_to_dialogic_module)
+    vtt_to_dialogic = vtt_to_dialogic_module.vtt_to_dialogic
+    
+    successful = 0
+    failed = 0
+    
+    # Fetch transcripts concurrently; executor.map keeps video order so the
+    # conversions and their logs below stay sequential
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        fetched = executor.map(fetch, videos_to_download)
+        for i, (video, (transcript_path, error)) in enumerate(zip(videos_to_download, fetched), 1):
+            video_id = video['id']
+            title = video.get('title', 'Unknown')
+            
+            logger.info(f"[{i}/{len(videos_to_download)}] {title}")
+            
+            if error:
+                logger.error(f"  ❌ Error: {error}")
+                failed += 1
+                continue
+            
+            if not transcript_path:
+                logger.warning(f"  No transcript available")
+                failed += 1
+                continue
             
             # Convert to dialogic format
             try:
-                import subprocess
                 dialogic_path = processed_dir / f"{video_id}_dialogic_transcript.json"
-                result = subprocess.run(
-                    ['python3', 'scripts/vtt-to-dialogic.py', 
-                     str(transcript_path), str(dialogic_path), video_id, title],
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                if result.returncode == 0:
-                    logger.info(f"  ✅ Processed")
-                    successful += 1
-                else:
-                    logger.warning(f"  ⚠️  Conversion failed")
-                    failed += 1
+                vtt_to_dialogic(transcript_path, dialogic_path, video_id, title)
+                logger.info(f"  ✅ Processed")
+                successful += 1
             except Exception as e:
                 logger.warning(f"  ⚠️  Could not convert: {e}")
                 failed += 1
-                
-        except Exception as e:
-            logger.error(f"  ❌ Error: {e}")
-            failed += 1
     
     logger.info(f"\n📊 Results: {successful} successful, {failed} failed")
     
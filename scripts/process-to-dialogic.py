@@ -3,14 +3,30 @@
 Convert processed transcript to dialogic format.
 """
 
-import json
+import re
 import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from utils import fast_json
+
+# Topic markers, matched against lowercased segment text. Only the start of
+# each word is anchored so that plurals ("examples") still match.
+INTRODUCTION_RE = re.compile(r"\b(?:introduction|welcome|today)")
+EXAMPLE_RE = re.compile(r"\b(?:example|for instance)")
+SUMMARY_RE = re.compile(r"\b(?:conclusion|summary|recap)")
+
+# Checked in order; the first matching category wins
+TOPIC_MARKERS = (
+    (INTRODUCTION_RE, 'introduction'),
+    (EXAMPLE_RE, 'example'),
+    (SUMMARY_RE, 'summary'),
+)
+
 def convert_to_dialogic(transcript_path, output_path=None):
     """Convert a processed transcript to dialogic format."""
-    with open(transcript_path, 'r') as f:
-        data = json.load(f)
+    with open(transcript_path, 'rb') as f:
+        data = fast_json.loads(f.read())
     
     # Extract video metadata
     video_id = data.get('video_id', Path(transcript_path).stem.replace('_transcript', ''))
@@ -18,6 +34,7 @@ def convert_to_dialogic(transcript_path, output_path=None):
     # Convert segments to dialogic format
     dialogic_segments = []
     segment_id = 1
+    total_duration = 0
     
     for segment in data.get('segments', []):
         start_time = segment.get('start_time', 0)
@@ -38,15 +55,13 @@ def convert_to_dialogic(transcript_path, output_path=None):
         
         # Add topic markers based on sentence boundaries or content
         text = dialogic_segment['text'].lower()
-        if any(word in text for word in ['introduction', 'welcome', 'today']):
-            dialogic_segment['topic_marker'] = 'introduction'
-        elif any(word in text for word in ['example', 'for instance']):
-            dialogic_segment['topic_marker'] = 'example'
-        elif any(word in text for word in ['conclusion', 'summary', 'recap']):
-            dialogic_segment['topic_marker'] = 'summary'
+        dialogic_segment['topic_marker'] = next(
+            (marker for pattern, marker in TOPIC_MARKERS if pattern.search(text)), None
+        )
         
         dialogic_segments.append(dialogic_segment)
         segment_id += 1
+        total_duration += duration
     
     # Create dialogic transcript
     dialogic_transcript = {
@@ -55,7 +70,7 @@ def convert_to_dialogic(transcript_path, output_path=None):
         'title': data.get('metadata', {}).get('title', 'Unknown'),
         'segments': dialogic_segments,
         'total_segments': len(dialogic_segments),
-        'total_duration': sum(s['duration'] for s in dialogic_segments),
+        'total_duration': total_duration,
         'metadata': {
             'source': 'khan-academy',
             'created': data.get('metadata', {}).get('created', '2025-01-20'),
@@ -67,8 +82,7 @@ def convert_to_dialogic(transcript_path, output_path=None):
     if output_path is None:
         output_path = Path(transcript_path).parent / f"{video_id}_dialogic_transcript.json"
     
-    with open(output_path, 'w') as f:
-        json.dump(dialogic_transcript, f, indent=2)
+    Path(output_path).write_bytes(fast_json.dumps(dialogic_transcript, indent=True))
     
     print(f"✅ Created dialogic transcript: {output_path}")
     print(f"   Segments: {len(dialogic_segments)}")
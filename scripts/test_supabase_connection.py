@@ -4,6 +4,7 @@ Test Supabase connection and verify schema.
 """
 
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
@@ -14,6 +15,9 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Tables created by supabase/migrations/001_create_transcripts_schema.sql
+TABLES = ('khan_videos', 'khan_transcripts', 'khan_transcript_chunks')
+
 
 def test_connection():
     """Test Supabase connection and verify tables exist."""
@@ -22,37 +26,13 @@ def test_connection():
         supabase = SupabaseStorage()
         logger.info(f"✓ Connected to Supabase: {supabase.supabase_url}")
         
-        # Test querying tables
-        logger.info("\nTesting table access...")
-        
-        # Check khan_videos table
-        try:
-            result = supabase.client.table('khan_videos').select('count', count='exact').limit(1).execute()
-            logger.info(f"✓ khan_videos table accessible (count: {result.count if hasattr(result, 'count') else 'N/A'})")
-        except Exception as e:
-            logger.warning(f"✗ khan_videos table: {e}")
-            logger.info("  → Run migration: supabase/migrations/001_create_transcripts_schema.sql")
-        
-        # Check khan_transcripts table
-        try:
-            result = supabase.client.table('khan_transcripts').select('count', count='exact').limit(1).execute()
-            logger.info(f"✓ khan_transcripts table accessible (count: {result.count if hasattr(result, 'count') else 'N/A'})")
-        except Exception as e:
-            logger.warning(f"✗ khan_transcripts table: {e}")
+        def count_rows(table):
+            return supabase.client.table(table).select('count', count='exact').limit(1).execute()
         
-        # Check khan_transcript_chunks table
-        try:
-            result = supabase.client.table('khan_transcript_chunks').select('count', count='exact').limit(1).execute()
-            logger.info(f"✓ khan_transcript_chunks table accessible (count: {result.count if hasattr(result, 'count') else 'N/A'})")
-        except Exception as e:
-            logger.warning(f"✗ khan_transcript_chunks table: {e}")
-        
-        # Test search function
-        logger.info("\nTesting search function...")
-        try:
+        def search_chunks():
             # Create a dummy embedding vector (1536 dimensions)
             dummy_embedding = [0.0] * 1536
-            result = supabase.client.rpc(
+            return supabase.client.rpc(
                 'search_transcript_chunks',
                 {
                     'query_embedding': dummy_embedding,
@@ -60,9 +40,31 @@ def test_connection():
                     'match_count': 1
                 }
             ).execute()
-            logger.info("✓ search_transcript_chunks function accessible")
-        except Exception as e:
-            logger.warning(f"✗ search_transcript_chunks function: {e}")
+        
+        # The probes are independent, so issue them all at once and report
+        # the results in order
+        with ThreadPoolExecutor(max_workers=len(TABLES) + 1) as executor:
+            table_probes = {table: executor.submit(count_rows, table) for table in TABLES}
+            search_probe = executor.submit(search_chunks)
+            
+            # Test querying tables
+            logger.info("\nTesting table access...")
+            for table, probe in table_probes.items():
+                try:
+                    result = probe.result()
+                    logger.info(f"✓ {table} table accessible (count: {result.count if hasattr(result, 'count') else 'N/A'})")
+                except Exception as e:
+                    logger.warning(f"✗ {table} table: {e}")
+                    if table == 'khan_videos':
+                        logger.info("  → Run migration: supabase/migrations/001_create_transcripts_schema.sql")
+            
+            # Test search function
+            logger.info("\nTesting search function...")
+            try:
+                search_probe.result()
+                logger.info("✓ search_transcript_chunks function accessible")
+            except Exception as e:
+                logger.warning(f"✗ search_transcript_chunks function: {e}")
         
         logger.info("\n✓ Supabase connection test complete!")
         return True
@@ -7,7 +7,12 @@ Organizes content according to the S3 course storage design.
 
 import sys
 import json
+import hashlib
+import threading
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import argparse
 import logging
@@ -20,20 +25,53 @@ logger = logging.getLogger(__name__)
 class S3CourseUploader:
     """Upload courses to S3 following the course storage design."""
     
-    def __init__(self, bucket: str = 'singh-courses', region: str = 'us-east-1'):
+    # Concurrent transcript uploads per course
+    MAX_WORKERS = 16
+    # Courses uploaded at once by upload_all_courses
+    COURSE_WORKERS = 4
+    # Files below this size go up in a single PUT; larger ones use multipart
+    MULTIPART_THRESHOLD = 5 * 1024 * 1024
+    # Upload state is written to disk after this many new uploads
+    STATE_FLUSH_EVERY = 50
+    
+    def __init__(self, bucket: str = 'singh-courses', region: str = 'us-east-1',
+                 state_path: Path = Path('.upload-state.json')):
         """
         Initialize S3 uploader.
         
         Args:
             bucket: S3 bucket name
             region: AWS region
+            state_path: Local record of uploaded files, used to skip unchanged ones
         """
         self.bucket = bucket
         self.region = region
         self.s3_client = None
         
+        # s3://bucket/key -> {'mtime', 'size', 'sha256'} of the last uploaded file
+        self.state_path = Path(state_path)
+        self._state = {}
+        self._state_lock = threading.Lock()
+        self._unsaved = 0
+        if self.state_path.exists():
+            try:
+                self._state = json.loads(self.state_path.read_text())
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable upload state {self.state_path}: {e}")
+        
         try:
-            self.s3_client = boto3.client('s3', region_name=region)
+            # Pool enough connections for the upload threads and retry throttling adaptively
+            config = Config(
+                max_pool_connections=self.MAX_WORKERS * self.COURSE_WORKERS,
+                tcp_keepalive=True,
+                retries={'max_attempts': 10, 'mode': 'adaptive'}
+            )
+            self.s3_client = boto3.client('s3', region_name=region, config=config)
+            self.transfer_config = TransferConfig(
+                multipart_threshold=self.MULTIPART_THRESHOLD,
+                max_concurrency=4,
+                use_threads=True
+            )
             # Test connection
             self.s3_client.head_bucket(Bucket=bucket)
             logger.info(f"✅ Connected to S3 bucket: {bucket}")
@@ -44,19 +82,78 @@ class S3CourseUploader:
             logger.info("  # or set AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY")
             raise
     
+    def save_state(self):
+        """Write the upload state to disk if it has changed."""
+        with self._state_lock:
+            self._save_state_locked()
+    
+    def _save_state_locked(self):
+        if not self._unsaved:
+            return
+        try:
+            # Write to a temporary file first so an interrupted run can't truncate the state
+            tmp_path = self.state_path.with_name(self.state_path.name + '.tmp')
+            tmp_path.write_text(json.dumps(self._state))
+            tmp_path.replace(self.state_path)
+            self._unsaved = 0
+        except Exception as e:
+            logger.warning(f"Failed to save upload state: {e}")
+    
+    def _record_upload(self, state_key: str, entry: Dict):
+        with self._state_lock:
+            self._state[state_key] = entry
+            self._unsaved += 1
+            if self._unsaved >= self.STATE_FLUSH_EVERY:
+                self._save_state_locked()
+    
+    @staticmethod
+    def _sha256(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
     def upload_file(self, local_path: Path, s3_key: str, content_type: str = None) -> bool:
-        """Upload a file to S3."""
+        """Upload a file to S3, skipping it if it is unchanged since the last upload."""
         try:
             extra_args = {}
             if content_type:
                 extra_args['ContentType'] = content_type
             
-            self.s3_client.upload_file(
-                str(local_path),
-                self.bucket,
-                s3_key,
-                ExtraArgs=extra_args
-            )
+            local_path = Path(local_path)
+            stat = local_path.stat()
+            state_key = f"s3://{self.bucket}/{s3_key}"
+            entry = {'mtime': stat.st_mtime_ns, 'size': stat.st_size}
+            previous = self._state.get(state_key)
+            if previous and previous['mtime'] == entry['mtime'] and previous['size'] == entry['size']:
+                logger.info(f"  ⏭️  Unchanged: {s3_key}")
+                return True
+            
+            # A touched file may still be identical: compare contents before uploading
+            entry['sha256'] = self._sha256(local_path)
+            if previous and previous.get('sha256') == entry['sha256']:
+                self._record_upload(state_key, entry)
+                logger.info(f"  ⏭️  Unchanged: {s3_key}")
+                return True
+            
+            if stat.st_size < self.MULTIPART_THRESHOLD:
+                # Small JSON files: one PUT, skipping the transfer manager's threads
+                self.s3_client.put_object(
+                    Bucket=self.bucket,
+                    Key=s3_key,
+                    Body=local_path.read_bytes(),
+                    **extra_args
+                )
+            else:
+                self.s3_client.upload_file(
+                    str(local_path),
+                    self.bucket,
+                    s3_key,
+                    ExtraArgs=extra_args,
+                    Config=self.transfer_config
+                )
+            self._record_upload(state_key, entry)
             logger.info(f"  ✅ Uploaded: {s3_key}")
             return True
         except Exception as e:
@@ -94,17 +191,47 @@ class S3CourseUploader:
         transcript_files = list(transcripts_dir.glob("*_dialogic_transcript.json"))
         logger.info(f"   Found {len(transcript_files)} transcript files")
         
-        for transcript_file in transcript_files:
+        def upload_transcript(transcript_file: Path) -> bool:
             # Extract video ID from filename
             video_id = transcript_file.stem.replace('_dialogic_transcript', '')
             
             # Upload transcript
             transcript_key = f"sources/{source}/courses/{course_id}/videos/{video_id}/transcript_dialogic.json"
-            self.upload_file(transcript_file, transcript_key, 'application/json')
+            return self.upload_file(transcript_file, transcript_key, 'application/json')
+        
+        # The S3 client is thread-safe, so overlap the per-file round trips
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            list(executor.map(upload_transcript, transcript_files))
+        self.save_state()
         
         logger.info(f"✅ Course uploaded: {course_id}")
         return True
     
+    def _fetch_metadata(self, course_path: str) -> Dict:
+        """Build a manifest entry for a course from its metadata.json."""
+        course_id = course_path.split('/')[-2]  # Get course ID from path
+        
+        # Try to get metadata
+        metadata_key = f"{course_path}metadata.json"
+        try:
+            obj = self.s3_client.get_object(Bucket=self.bucket, Key=metadata_key)
+            metadata = json.loads(obj['Body'].read())
+            return {
+                'course_id': course_id,
+                'title': metadata.get('title', course_id),
+                'subject': metadata.get('subject', ''),
+                'path': course_path,
+                'metadata_path': metadata_key,
+                'video_count': len(metadata.get('videos', [])),
+            }
+        except:
+            # Metadata not found, use defaults
+            return {
+                'course_id': course_id,
+                'title': course_id,
+                'path': course_path,
+            }
+    
     def update_manifest(self, source: str = 'khan-academy'):
         """
         Update source manifest with available courses.
@@ -113,39 +240,21 @@ class S3CourseUploader:
             source: Source identifier (khan-academy, mit-ocw, etc.)
         """
         try:
-            # List all courses in S3
+            # List all courses in S3; a single call stops at 1000 prefixes
             prefix = f"sources/{source}/courses/"
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.bucket,
-                Prefix=prefix,
-                Delimiter='/'
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            # A generator, so each page's metadata fetches are submitted while
+            # the next page is still being listed
+            course_paths = (
+                prefix_info['Prefix']
+                for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, Delimiter='/',
+                                               PaginationConfig={'PageSize': 1000})
+                for prefix_info in page.get('CommonPrefixes', [])
             )
             
-            courses = []
-            for prefix_info in response.get('CommonPrefixes', []):
-                course_path = prefix_info['Prefix']
-                course_id = course_path.split('/')[-2]  # Get course ID from path
-                
-                # Try to get metadata
-                metadata_key = f"{course_path}metadata.json"
-                try:
-                    obj = self.s3_client.get_object(Bucket=self.bucket, Key=metadata_key)
-                    metadata = json.loads(obj['Body'].read())
-                    courses.append({
-                        'course_id': course_id,
-                        'title': metadata.get('title', course_id),
-                        'subject': metadata.get('subject', ''),
-                        'path': course_path,
-                        'metadata_path': metadata_key,
-                        'video_count': len(metadata.get('videos', [])),
-                    })
-                except:
-                    # Metadata not found, use defaults
-                    courses.append({
-                        'course_id': course_id,
-                        'title': course_id,
-                        'path': course_path,
-                    })
+            # Fetch course metadata concurrently, keeping listing order
+            with ThreadPoolExecutor(max_workers=self.MAX_WORKERS * 2) as executor:
+                courses = list(executor.map(self._fetch_metadata, course_paths))
             
             # Create/update source manifest
             manifest = {
@@ -189,10 +298,12 @@ def upload_all_courses(local_data_dir: Path, bucket: str = 'singh-courses'):
     course_files = list(metadata_dir.glob("*.json"))
     logger.info(f"Found {len(course_files)} course metadata files")
     
-    for course_file in course_files:
-        uploader.upload_course(course_file, transcripts_dir)
+    # Courses are independent, so upload several at once through the shared client
+    with ThreadPoolExecutor(max_workers=uploader.COURSE_WORKERS) as executor:
+        list(executor.map(lambda course_file: uploader.upload_course(course_file, transcripts_dir),
+                          course_files))
     
-    # Update manifest
+    # Update manifest once every course is up
     uploader.update_manifest('khan-academy')
 
 
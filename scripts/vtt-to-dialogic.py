@@ -4,118 +4,216 @@ Convert WebVTT transcript directly to dialogic format.
 """
 
 import re
-import json
 import sys
+import queue
+import threading
 from pathlib import Path
 from datetime import timedelta
 
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from utils import fast_json
+
+# WebVTT cue timing line; cue settings may follow the end timestamp
+TIMING_RE = re.compile(r'(\d{2}:\d{2}:\d{2}\.\d{3})\s+-->\s+(\d{2}:\d{2}:\d{2}\.\d{3})')
+TIMESTAMP_RE = re.compile(r'(\d{2}):(\d{2}):(\d{2})\.(\d{3})')
+TAG_RE = re.compile(r'<[^>]+>')
+WHITESPACE_RE = re.compile(r'\s+')
+
+# Topic markers, matched against lowercased segment text. Only the start of
+# each word is anchored so that plurals ("examples", "variables") still match.
+INTRODUCTION_RE = re.compile(r"\b(?:welcome|introduction|today)")
+EXAMPLE_RE = re.compile(r"\b(?:example|for instance|let's say)")
+SUMMARY_RE = re.compile(r"\b(?:conclusion|summary|recap|that's)")
+DEFINITION_RE = re.compile(r"\b(?:variable|symbol|letter)")
+
+# Checked in order; the first matching category wins
+TOPIC_MARKERS = (
+    (INTRODUCTION_RE, 'introduction'),
+    (EXAMPLE_RE, 'example'),
+    (SUMMARY_RE, 'summary'),
+    (DEFINITION_RE, 'definition'),
+)
+
+def parse_time_ms(time_str):
+    """Parse WebVTT time format (HH:MM:SS.mmm) to integer milliseconds."""
+    hours, minutes, seconds, milliseconds = TIMESTAMP_RE.match(time_str).groups()
+    return int(hours) * 3_600_000 + int(minutes) * 60_000 + int(seconds) * 1000 + int(milliseconds)
+
 def parse_time(time_str):
     """Parse WebVTT time format (HH:MM:SS.mmm) to seconds."""
-    parts = time_str.split(':')
-    hours = float(parts[0])
-    minutes = float(parts[1])
-    seconds_parts = parts[2].split('.')
-    seconds = float(seconds_parts[0])
-    milliseconds = float(seconds_parts[1]) if len(seconds_parts) > 1 else 0
-    return hours * 3600 + minutes * 60 + seconds + milliseconds / 1000
+    return parse_time_ms(time_str) / 1000
 
-def vtt_to_dialogic(vtt_path, output_path=None, video_id=None, title=None):
-    """Convert VTT file to dialogic format."""
-    if video_id is None:
-        video_id = Path(vtt_path).stem.replace('.en', '').replace('.vtt', '')
+def iter_cues(lines):
+    """
+    Yield (start, end, text) for each cue in WebVTT lines.
     
-    if output_path is None:
-        output_path = Path(vtt_path).parent.parent / 'processed' / f'{video_id}_dialogic_transcript.json'
-    
-    output_path = Path(output_path)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
+    A cue's text runs from its timing line to the next blank line or
+    timing line; its lines are joined with spaces.
+    """
+    start = end = None
+    text_lines = []
+    for line in lines:
+        line = line.strip()
+        timing = TIMING_RE.match(line)
+        if timing or not line:
+            if start is not None:
+                yield start, end, ' '.join(text_lines)
+            start, end = timing.groups() if timing else (None, None)
+            text_lines = []
+        elif start is not None:
+            text_lines.append(line)
     
+    if start is not None:
+        yield start, end, ' '.join(text_lines)
+
+def build_dialogic_transcript(lines, video_id, title=None):
+    """Build a dialogic transcript dict from WebVTT lines."""
     segments = []
     segment_id = 1
+    total_duration = 0
     
-    with open(vtt_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Parse WebVTT format
-    # Pattern: timestamp line followed by text lines
-    pattern = r'(\d{2}:\d{2}:\d{2}\.\d{3})\s+-->\s+(\d{2}:\d{2}:\d{2}\.\d{3})\s*\n(.*?)(?=\n\d{2}:\d{2}:\d{2}\.\d{3}|\n\n|$)'
-    matches = re.finditer(pattern, content, re.MULTILINE | re.DOTALL)
-    
-    for match in matches:
-        start_time_str = match.group(1)
-        end_time_str = match.group(2)
-        text = match.group(3).strip()
-        
+    for start_time_str, end_time_str, text in iter_cues(lines):
         # Remove WebVTT tags and clean text
-        text = re.sub(r'<[^>]+>', '', text)  # Remove HTML tags
-        text = re.sub(r'\n+', ' ', text)  # Replace newlines with spaces
-        text = ' '.join(text.split())  # Normalize whitespace
+        text = TAG_RE.sub('', text)  # Remove HTML tags
+        text = WHITESPACE_RE.sub(' ', text).strip()  # Collapse newlines and whitespace
         
         if not text:
             continue
         
-        start_time = parse_time(start_time_str)
-        end_time = parse_time(end_time_str)
-        duration = end_time - start_time
+        # Integer milliseconds avoid float round-off; whole seconds are emitted
+        start_ms = parse_time_ms(start_time_str)
+        end_ms = parse_time_ms(end_time_str)
+        duration_ms = end_ms - start_ms
+        duration = duration_ms // 1000
         
-        # Determine pause duration (longer for longer segments)
-        pause_duration = min(3000, max(1500, int(duration * 200)))
+        # Determine pause duration (longer for longer segments): 200 ms per second
+        pause_duration = min(3000, max(1500, duration_ms // 5))
         
         # Detect topic markers
-        topic_marker = None
         text_lower = text.lower()
-        if any(word in text_lower for word in ['welcome', 'introduction', 'today']):
-            topic_marker = 'introduction'
-        elif any(word in text_lower for word in ['example', 'for instance', 'let\'s say']):
-            topic_marker = 'example'
-        elif any(word in text_lower for word in ['conclusion', 'summary', 'recap', 'that\'s']):
-            topic_marker = 'summary'
-        elif any(word in text_lower for word in ['variable', 'symbol', 'letter']):
-            topic_marker = 'definition'
+        topic_marker = next((marker for pattern, marker in TOPIC_MARKERS if pattern.search(text_lower)), None)
         
         segments.append({
             'segment_id': segment_id,
             'text': text,
-            'start_time': int(start_time),
-            'end_time': int(end_time),
-            'duration': int(duration),
+            'start_time': start_ms // 1000,
+            'end_time': end_ms // 1000,
+            'duration': duration,
             'allows_questions': True,
             'pause_duration': pause_duration,
             'topic_marker': topic_marker
         })
         segment_id += 1
+        total_duration += duration
     
     # Create dialogic transcript
-    dialogic_transcript = {
+    return {
         'class_id': 'algebra-basics-intro',
         'video_id': video_id,
         'title': title or 'Introduction to variables',
         'segments': segments,
         'total_segments': len(segments),
-        'total_duration': sum(s['duration'] for s in segments),
+        'total_duration': total_duration,
         'metadata': {
             'source': 'khan-academy',
             'created': '2025-01-20',
             'format_version': '1.0'
         }
     }
+
+def default_video_id(vtt_path):
+    """Derive a video ID from a VTT filename."""
+    return Path(vtt_path).stem.replace('.en', '').replace('.vtt', '')
+
+def vtt_to_dialogic(vtt_path, output_path=None, video_id=None, title=None):
+    """Convert VTT file to dialogic format."""
+    if video_id is None:
+        video_id = default_video_id(vtt_path)
+    
+    if output_path is None:
+        output_path = Path(vtt_path).parent.parent / 'processed' / f'{video_id}_dialogic_transcript.json'
+    
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    
+    # Parse WebVTT format one line at a time instead of reading the whole file
+    with open(vtt_path, 'r', encoding='utf-8') as f:
+        dialogic_transcript = build_dialogic_transcript(f, video_id, title)
     
     # Save
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(dialogic_transcript, f, indent=2, ensure_ascii=False)
+    output_path.write_bytes(fast_json.dumps(dialogic_transcript, indent=True))
     
     print(f"✅ Created dialogic transcript: {output_path}")
-    print(f"   Segments: {len(segments)}")
+    print(f"   Segments: {dialogic_transcript['total_segments']}")
     print(f"   Total duration: {dialogic_transcript['total_duration']} seconds")
     print(f"   Video: {title or video_id}")
     
     return dialogic_transcript
 
+def batch_convert(vtt_paths, output_dir):
+    """
+    Convert many VTT files to dialogic format in a read/parse/write pipeline.
+    
+    Reading, parsing and writing run in separate threads joined by bounded
+    queues, so file I/O for one transcript overlaps parsing of another.
+    
+    Returns the number of transcripts written.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    # Small queues keep only a few transcripts in memory at once
+    raw_queue = queue.Queue(maxsize=8)
+    parsed_queue = queue.Queue(maxsize=8)
+    
+    def read():
+        for vtt_path in vtt_paths:
+            try:
+                raw_queue.put((vtt_path, Path(vtt_path).read_text(encoding='utf-8')))
+            except Exception as e:
+                print(f"❌ Could not read {vtt_path}: {e}")
+        raw_queue.put(None)
+    
+    def parse():
+        while (item := raw_queue.get()) is not None:
+            vtt_path, text = item
+            video_id = default_video_id(vtt_path)
+            try:
+                parsed_queue.put((video_id, build_dialogic_transcript(text.splitlines(), video_id)))
+            except Exception as e:
+                print(f"❌ Could not convert {vtt_path}: {e}")
+        parsed_queue.put(None)
+    
+    stages = [threading.Thread(target=read, daemon=True), threading.Thread(target=parse, daemon=True)]
+    for stage in stages:
+        stage.start()
+    
+    # Write in this thread
+    written = 0
+    while (item := parsed_queue.get()) is not None:
+        video_id, dialogic_transcript = item
+        output_path = output_dir / f'{video_id}_dialogic_transcript.json'
+        output_path.write_bytes(fast_json.dumps(dialogic_transcript, indent=True))
+        written += 1
+    
+    for stage in stages:
+        stage.join()
+    
+    print(f"✅ Created {written} dialogic transcripts in {output_dir}")
+    return written
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Usage: python vtt-to-dialogic.py <transcript.vtt> [output.json] [video_id] [title]")
+        print("       python vtt-to-dialogic.py <vtt_dir> [output_dir]")
         sys.exit(1)
     
+    if Path(sys.argv[1]).is_dir():
+        vtt_dir = Path(sys.argv[1])
+        output_dir = Path(sys.argv[2]) if len(sys.argv) > 2 else vtt_dir.parent / 'processed'
+        batch_convert(sorted(vtt_dir.glob('*.vtt')), output_dir)
+        sys.exit(0)
+    
     vtt_path = sys.argv[1]
     output_path = sys.argv[2] if len(sys.argv) > 2 else None
     video_id = sys.argv[3] if len(sys.argv) > 3 else None
@@ -6,12 +6,18 @@ and discover all available courses, videos, and transcripts.
 """
 
 import requests
-import json
-import time
-from typing import Dict, List, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Set
 from pathlib import Path
 import logging
 
+from utils.catalog import save_catalog
+from utils.http_cache import cached_session, get_cached
+from utils.rate_limit import AdaptiveRateLimiter
+
 logger = logging.getLogger(__name__)
 
 
@@ -27,19 +33,37 @@ class KhanAcademyAPI:
     
     BASE_URL = "https://www.khanacademy.org"
     API_BASE = "https://www.khanacademy.org/api/v1"
+    CACHE_PATH = Path("data/cache/khan_api")
     
-    def __init__(self, rate_limit_delay: float = 0.5):
+    def __init__(self, rate_limit_delay: float = 0.5, session: Optional[requests.Session] = None,
+                 max_workers: int = 8, cache_path: Optional[Path] = CACHE_PATH):
         """
         Initialize the Khan Academy API client.
         
         Args:
             rate_limit_delay: Delay between requests in seconds
+            session: Preconfigured requests session (a pooled, retrying one is created if omitted)
+            max_workers: Number of topics fetched concurrently during discovery
+            cache_path: On-disk response cache for the created session (None disables caching)
         """
-        self.session = requests.Session()
+        if session is None:
+            session = cached_session(cache_path)
+            # 429s and server errors are retried, waiting out any Retry-After header
+            retry = Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504),
+                          respect_retry_after_header=True, raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        self.session = session
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
         })
         self.rate_limit_delay = rate_limit_delay
+        self.max_workers = max_workers
+        # Shared by concurrent topic fetches so they respect the overall delay;
+        # slows everyone down if the server keeps answering 429
+        self.rate_limiter = AdaptiveRateLimiter.from_delay(rate_limit_delay)
+        # Successful topic/video lookups by (kind, slug), for the life of the client
         self._cache = {}
     
     def _request(self, endpoint: str, params: Optional[Dict] = None) -> Dict:
@@ -56,8 +80,16 @@ class KhanAcademyAPI:
         url = f"{self.API_BASE}/{endpoint.lstrip('/')}"
         
         try:
-            time.sleep(self.rate_limit_delay)
-            response = self.session.get(url, params=params)
+            # Cached responses need no network round trip, so they skip the rate limit
+            response = get_cached(self.session, url, params=params)
+            if response is None:
+                self.rate_limiter.acquire()
+                response = self.session.get(url, params=params)
+                # Still throttled after the adapter's retries: back off for all workers
+                if response.status_code == 429:
+                    self.rate_limiter.throttled()
+                else:
+                    self.rate_limiter.succeeded()
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -90,9 +122,15 @@ class KhanAcademyAPI:
         Returns:
             Topic content dictionary
         """
+        cached = self._cache.get(('topic', topic_slug))
+        if cached is not None:
+            return cached
+        
         logger.info(f"Fetching content for topic: {topic_slug}")
         try:
             data = self._request(f"topic/{topic_slug}")
+            if data:
+                self._cache[('topic', topic_slug)] = data
             return data
         except Exception as e:
             logger.error(f"Failed to fetch topic content for {topic_slug}: {e}")
@@ -108,9 +146,15 @@ class KhanAcademyAPI:
         Returns:
             Video information dictionary
         """
+        cached = self._cache.get(('video', video_slug))
+        if cached is not None:
+            return cached
+        
         logger.info(f"Fetching video info: {video_slug}")
         try:
             data = self._request(f"video/{video_slug}")
+            if data:
+                self._cache[('video', video_slug)] = data
             return data
         except Exception as e:
             logger.error(f"Failed to fetch video info for {video_slug}: {e}")
@@ -127,46 +171,58 @@ class KhanAcademyAPI:
         """
         logger.info("Starting comprehensive video discovery...")
         all_videos = []
-        topics = self.get_topics()
+        # Shared across topics so subtrees listed under several topics are walked once
+        seen = set()
+        topic_slugs = [topic.get("slug") or topic.get("id") for topic in self.get_topics()]
+        topic_slugs = [slug for slug in topic_slugs if slug]
         
-        for topic in topics:
-            topic_slug = topic.get("slug") or topic.get("id")
-            if not topic_slug:
-                continue
+        # Topic fetches are independent, so overlap them under the shared rate limiter
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for topic_slug, topic_content in zip(topic_slugs, executor.map(self.get_topic_content, topic_slugs)):
+                # Stream videos from the topic tree straight into the result
+                found_before = len(all_videos)
+                all_videos.extend(self._iter_videos_from_topic(topic_content, seen))
                 
-            logger.info(f"Processing topic: {topic.get('title', topic_slug)}")
-            topic_content = self.get_topic_content(topic_slug)
-            
-            # Recursively extract videos from topic tree
-            videos = self._extract_videos_from_topic(topic_content)
-            all_videos.extend(videos)
-            
-            logger.info(f"Found {len(videos)} videos in {topic_slug}")
+                logger.info(f"Found {len(all_videos) - found_before} videos in {topic_slug}")
         
         logger.info(f"Total videos discovered: {len(all_videos)}")
         return all_videos
     
-    def _extract_videos_from_topic(self, topic_data: Dict) -> List[Dict]:
+    def _iter_videos_from_topic(self, topic_data: Dict, seen: Optional[Set[str]] = None) -> Iterator[Dict]:
         """
-        Recursively extract all videos from a topic tree.
+        Yield all videos in a topic tree.
+        
+        The tree is walked depth-first with an explicit stack, so deep trees
+        can't hit the recursion limit, and nodes are visited in the same
+        order as a recursive walk.
         
         Args:
             topic_data: Topic data dictionary
+            seen: IDs/slugs of nodes already walked; nodes found here are
+                skipped and new ones added (pass one set across topics to
+                collapse shared subtrees)
             
-        Returns:
-            List of video dictionaries
+        Yields:
+            Video dictionaries
         """
-        videos = []
-        
-        # Check if this node is a video
-        if topic_data.get("kind") == "Video":
-            videos.append(topic_data)
-        
-        # Recursively process children
-        for child in topic_data.get("children", []):
-            videos.extend(self._extract_videos_from_topic(child))
+        if seen is None:
+            seen = set()
         
-        return videos
+        stack = deque([topic_data])
+        while stack:
+            node = stack.pop()
+            node_id = node.get("id") or node.get("slug")
+            if node_id is not None:
+                if node_id in seen:
+                    continue
+                seen.add(node_id)
+            
+            # Check if this node is a video
+            if node.get("kind") == "Video":
+                yield node
+            
+            # Push children reversed so the first child is walked first
+            stack.extend(reversed(node.get("children", [])))
     
     def get_video_transcript(self, video_slug: str) -> Optional[str]:
         """
@@ -199,9 +255,7 @@ class KhanAcademyAPI:
             videos: List of video dictionaries
             output_path: Path to save the catalog
         """
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(videos, f, indent=2, ensure_ascii=False)
+        save_catalog(videos, output_path)
         logger.info(f"Saved catalog with {len(videos)} videos to {output_path}")
 
 
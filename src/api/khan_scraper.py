@@ -5,15 +5,33 @@ Since the API has been removed, we scrape the website to discover videos.
 """
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
 import re
 import logging
-import time
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Dict, Optional
+from pathlib import Path
 from urllib.parse import urljoin, urlparse
 
+from utils.http_cache import cached_session, get_cached
+from utils.rate_limit import AdaptiveRateLimiter
+
 logger = logging.getLogger(__name__)
 
+# YouTube URL formats, tried in order (see extract_youtube_id_from_url)
+YOUTUBE_URL_PATTERNS = (
+    re.compile(r'(?:youtube\.com\/watch\?v=|youtu\.be\/|youtube\.com\/embed\/)([a-zA-Z0-9_-]{11})'),
+    re.compile(r'youtube\.com\/.*[?&]v=([a-zA-Z0-9_-]{11})'),
+)
+YOUTUBE_SRC_RE = re.compile(r'youtube\.com')
+YOUTUBE_IN_SCRIPT_RE = re.compile(r'youtube\.com[^"\' ]*v=([a-zA-Z0-9_-]{11})')
+TITLE_SUFFIX_RE = re.compile(r'\s*\|\s*Khan Academy\s*$')
+
+# Topic pages are only searched for links, so only <a href> tags are parsed
+LINKS_ONLY = SoupStrainer('a', href=True)
+
 
 class KhanAcademyScraper:
     """
@@ -21,19 +39,38 @@ class KhanAcademyScraper:
     """
     
     BASE_URL = "https://www.khanacademy.org"
+    MAX_WORKERS = 32
+    CACHE_PATH = Path("data/cache/khan_scraper")
     
-    def __init__(self, rate_limit_delay: float = 1.0):
+    def __init__(self, rate_limit_delay: float = 1.0, cache_path: Optional[Path] = CACHE_PATH,
+                 session: Optional[requests.Session] = None):
         """
         Initialize scraper.
         
         Args:
             rate_limit_delay: Delay between requests in seconds
+            cache_path: On-disk cache for fetched pages (None disables caching)
+            session: Preconfigured requests session, e.g. one shared with
+                KhanAcademyAPI so both reuse the same khanacademy.org
+                connections (a cached, pooled, retrying one is created if omitted)
         """
-        self.session = requests.Session()
+        if session is None:
+            session = cached_session(cache_path)
+            # One pooled connection per worker; 429s and transient server errors are
+            # retried with backoff, waiting out any Retry-After header
+            retry = Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504),
+                          respect_retry_after_header=True, raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=self.MAX_WORKERS, pool_maxsize=self.MAX_WORKERS, max_retries=retry)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        self.session = session
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         })
         self.rate_limit_delay = rate_limit_delay
+        # Shared by all worker threads so concurrency never exceeds the configured rate;
+        # slows everyone down if the server keeps answering 429
+        self.rate_limiter = AdaptiveRateLimiter.from_delay(rate_limit_delay)
     
     def extract_youtube_id_from_url(self, url: str) -> Optional[str]:
         """
@@ -44,17 +81,26 @@ class KhanAcademyScraper:
         - https://youtu.be/VIDEO_ID
         - https://www.youtube.com/embed/VIDEO_ID
         """
-        patterns = [
-            r'(?:youtube\.com\/watch\?v=|youtu\.be\/|youtube\.com\/embed\/)([a-zA-Z0-9_-]{11})',
-            r'youtube\.com\/.*[?&]v=([a-zA-Z0-9_-]{11})',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
+        for pattern in YOUTUBE_URL_PATTERNS:
+            match = pattern.search(url)
             if match:
                 return match.group(1)
         return None
     
+    def _get(self, url: str) -> requests.Response:
+        """GET a page, serving fresh cached copies without spending rate limit."""
+        response = get_cached(self.session, url, timeout=10)
+        if response is None:
+            self.rate_limiter.acquire()
+            response = self.session.get(url, timeout=10)
+            # Still throttled after the adapter's retries: back off for all workers
+            if response.status_code == 429:
+                self.rate_limiter.throttled()
+            else:
+                self.rate_limiter.succeeded()
+        response.raise_for_status()
+        return response
+    
     def scrape_video_page(self, video_url: str) -> Optional[Dict]:
         """
         Scrape a Khan Academy video page to extract metadata.
@@ -66,28 +112,25 @@ class KhanAcademyScraper:
             Dictionary with video metadata or None
         """
         try:
-            time.sleep(self.rate_limit_delay)
-            response = self.session.get(video_url, timeout=10)
-            response.raise_for_status()
+            response = self._get(video_url)
             
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = BeautifulSoup(response.content, 'lxml')
             
             # Extract YouTube ID from page
             youtube_id = None
             
             # Try to find YouTube iframe or embed
-            iframe = soup.find('iframe', {'src': re.compile(r'youtube\.com')})
+            iframe = soup.find('iframe', {'src': YOUTUBE_SRC_RE})
             if iframe:
                 youtube_id = self.extract_youtube_id_from_url(iframe.get('src', ''))
             
-            # Try to find in script tags (Khan Academy embeds YouTube)
-            scripts = soup.find_all('script')
-            for script in scripts:
-                if script.string:
-                    match = re.search(r'youtube\.com[^"\' ]*v=([a-zA-Z0-9_-]{11})', script.string)
-                    if match:
-                        youtube_id = match.group(1)
-                        break
+            # Try to find in script tags (Khan Academy embeds YouTube). One search
+            # over all scripts finds the same first match as searching each in
+            # turn; the space separator can't be part of a match
+            scripts = ' '.join(script.string for script in soup.find_all('script') if script.string)
+            match = YOUTUBE_IN_SCRIPT_RE.search(scripts)
+            if match:
+                youtube_id = match.group(1)
             
             if not youtube_id:
                 logger.warning(f"Could not extract YouTube ID from {video_url}")
@@ -99,7 +142,7 @@ class KhanAcademyScraper:
             if title_tag:
                 title = title_tag.get_text().strip()
                 # Remove " | Khan Academy" suffix
-                title = re.sub(r'\s*\|\s*Khan Academy\s*$', '', title)
+                title = TITLE_SUFFIX_RE.sub('', title)
             
             # Extract description
             description = None
@@ -108,20 +151,10 @@ class KhanAcademyScraper:
                 description = meta_desc.get('content', '').strip()
             
             # Extract topic/subject from URL or breadcrumbs
-            parsed_url = urlparse(video_url)
-            path_parts = [p for p in parsed_url.path.split('/') if p]
-            
-            topic = None
-            subject = None
-            course = None
-            
-            # Khan Academy URLs typically: /subject/course/topic/video-slug
-            if len(path_parts) >= 2:
-                subject = path_parts[0]
-            if len(path_parts) >= 3:
-                course = path_parts[1]
-            if len(path_parts) >= 4:
-                topic = path_parts[2]
+            # Khan Academy URLs typically: /subject/course/topic/video-slug;
+            # drop the video slug and pad missing levels with None
+            path_parts = [p for p in urlparse(video_url).path.split('/') if p][:-1]
+            subject, course, topic = (path_parts + [None, None, None])[:3]
             
             return {
                 'youtube_id': youtube_id,
@@ -136,6 +169,30 @@ class KhanAcademyScraper:
             logger.error(f"Failed to scrape video page {video_url}: {e}")
             return None
     
+    def scrape_video_pages(self, video_urls: List[str],
+                           max_workers: Optional[int] = None) -> Iterator[Optional[Dict]]:
+        """
+        Scrape many video pages concurrently.
+        
+        Requests overlap their network round trips while the shared rate
+        limiter keeps the overall request rate unchanged.
+        
+        Args:
+            video_urls: URLs to Khan Academy video pages
+            max_workers: Number of concurrent requests (derived from the rate limit by default)
+        
+        Yields:
+            Video metadata dictionary or None for each URL, in input order
+        """
+        if max_workers is None:
+            if self.rate_limit_delay > 0:
+                max_workers = max(1, min(self.MAX_WORKERS, int(8 / self.rate_limit_delay)))
+            else:
+                max_workers = self.MAX_WORKERS
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            yield from executor.map(self.scrape_video_page, video_urls)
+    
     def discover_videos_from_topic(self, topic_url: str, max_videos: Optional[int] = None) -> List[Dict]:
         """
         Discover videos from a Khan Academy topic/course page.
@@ -150,33 +207,28 @@ class KhanAcademyScraper:
         videos = []
         
         try:
-            time.sleep(self.rate_limit_delay)
-            response = self.session.get(topic_url, timeout=10)
-            response.raise_for_status()
+            response = self._get(topic_url)
             
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = BeautifulSoup(response.content, 'lxml', parse_only=LINKS_ONLY)
             
             # Find all video links
             # Khan Academy video links typically have specific patterns
-            video_links = []
+            # A dict keeps page order while making duplicate checks O(1)
+            video_links = {}
             
             # Look for links to video pages
             for link in soup.find_all('a', href=True):
                 href = link.get('href', '')
                 # Khan Academy video URLs typically contain specific patterns
                 if '/v/' in href or '/video/' in href:
-                    full_url = urljoin(self.BASE_URL, href)
-                    if full_url not in video_links:
-                        video_links.append(full_url)
+                    video_links[urljoin(self.BASE_URL, href)] = None
+            video_links = list(video_links)
             
             logger.info(f"Found {len(video_links)} video links on {topic_url}")
             
             # Scrape each video page
-            for video_url in video_links[:max_videos] if max_videos else video_links:
-                video_data = self.scrape_video_page(video_url)
-                if video_data:
-                    videos.append(video_data)
-                time.sleep(self.rate_limit_delay)
+            video_links = video_links[:max_videos] if max_videos else video_links
+            videos = [v for v in self.scrape_video_pages(video_links) if v]
             
         except Exception as e:
             logger.error(f"Failed to discover videos from {topic_url}: {e}")
@@ -199,10 +251,10 @@ class KhanAcademyScraper:
         
         for sitemap_url in sitemap_urls:
             try:
-                time.sleep(self.rate_limit_delay)
+                self.rate_limiter.acquire()
                 response = self.session.get(sitemap_url, timeout=10)
                 if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'xml')
+                    soup = BeautifulSoup(response.content, 'lxml-xml')
                     # Find all video URLs
                     for loc in soup.find_all('loc'):
                         url = loc.get_text()
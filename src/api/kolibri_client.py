@@ -5,13 +5,92 @@ Client for interacting with Kolibri server to discover and download
 Khan Academy content, transcripts, and metadata.
 """
 
+import re
+import shutil
+import time
 import requests
-from typing import Dict, List, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
 import logging
 
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+except ImportError:  # pragma: no cover - optional dependency
+    ijson = None
+
 logger = logging.getLogger(__name__)
 
+# Concurrent requests used when fetching per-video details
+MAX_WORKERS = 16
+
+# Content nodes requested per page when the server paginates
+PAGE_SIZE = 1000
+
+# Seconds a test_connection result is reused before probing again
+CONNECTION_CHECK_TTL = 30
+
+# File presets that hold subtitles or transcripts
+SUBTITLE_PRESET_RE = re.compile(r'subtitle|transcript|vtt', re.IGNORECASE)
+
+# Full length reported with a 416 response, e.g. "bytes */12345"
+UNSATISFIED_RANGE_RE = re.compile(r'bytes \*/(\d+)')
+
+
+def is_subtitle_file(file_info: Dict) -> bool:
+    """Return True if a Kolibri file entry holds subtitles or a transcript."""
+    return SUBTITLE_PRESET_RE.search(file_info.get('preset', '')) is not None
+
+
+def _iter_page_items(response: requests.Response, page: Dict) -> Iterator:
+    """
+    Yield the items of a Kolibri list response as they are parsed.
+    
+    Handles both a bare JSON array and a paginated {"next": ..., "results": [...]}
+    object; the object's "next" link is stored in page. The body is
+    stream-parsed with ijson when it is installed, so a large listing is
+    never held in memory as text.
+    
+    Args:
+        response: Streamed (stream=True) response
+        page: Receives the "next" link of a paginated response
+        
+    Yields:
+        Decoded list items
+    """
+    if ijson is None:
+        results = response.json()
+        if isinstance(results, dict):
+            page['next'] = results.get('next')
+            yield from results.get('results', [])
+        elif isinstance(results, list):
+            yield from results
+        return
+    
+    response.raw.decode_content = True
+    items_prefix = None
+    builder = None
+    for prefix, event, value in ijson.parse(response.raw, use_float=True):
+        if items_prefix is None:
+            # The first event tells a bare array from a paginated object
+            items_prefix = 'item' if event == 'start_array' else 'results.item'
+        elif prefix == items_prefix and event in ('start_map', 'start_array'):
+            builder = ObjectBuilder()
+            builder.event(event, value)
+        elif prefix == items_prefix and event in ('end_map', 'end_array'):
+            builder.event(event, value)
+            yield builder.value
+            builder = None
+        elif builder is not None:
+            builder.event(event, value)
+        elif prefix == items_prefix:
+            yield value
+        elif prefix == 'next' and items_prefix == 'results.item':
+            page['next'] = value
+
 
 class KolibriClient:
     """
@@ -21,33 +100,67 @@ class KolibriClient:
     including Khan Academy videos, transcripts, and metadata.
     """
     
-    def __init__(self, base_url: str = "http://localhost:8080"):
+    def __init__(self, base_url: str = "http://localhost:8080",
+                 session: Optional[requests.Session] = None):
         """
         Initialize Kolibri client.
         
         Args:
             base_url: Base URL of Kolibri server (default: http://localhost:8080)
+            session: Preconfigured requests session to share with other clients
+                (a pooled, retrying one is created if omitted)
         """
         self.base_url = base_url.rstrip('/')
         self.api_url = f"{self.base_url}/api"
-        self.session = requests.Session()
+        if session is None:
+            session = requests.Session()
+            # Keep one reusable connection per concurrent worker (see get_video_details)
+            # and retry transient failures with a short backoff; raise_on_status=False
+            # hands the last response back so callers still see the final status
+            retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504],
+                          raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS, max_retries=retry)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
         self.session.headers.update({
             'Accept': 'application/json',
         })
+        # Khan Academy channel, looked up once per client
+        self._khan_academy_channel = None
+        # (monotonic time, result) of the last test_connection probe
+        self._connection_check = None
     
-    def test_connection(self) -> bool:
-        """Test if Kolibri server is accessible."""
+    def test_connection(self, timeout: float = 10) -> bool:
+        """
+        Test if Kolibri server is accessible.
+        
+        Args:
+            timeout: Seconds to wait for the server to respond
+            
+        Returns:
+            True if the server answered
+        """
+        # Workflows check repeatedly; reuse a recent answer instead of re-probing
+        if self._connection_check is not None:
+            checked_at, ok = self._connection_check
+            if time.monotonic() - checked_at < CONNECTION_CHECK_TTL:
+                return ok
+        
         try:
-            # Try with longer timeout and handle redirects
-            response = self.session.get(f"{self.api_url}/content/channel", timeout=10, allow_redirects=True)
+            # HEAD skips downloading the channel list; handle redirects
+            response = self.session.head(f"{self.api_url}/content/channel", timeout=timeout, allow_redirects=True)
             # Accept 200 or 301/302 (redirects)
-            return response.status_code in [200, 301, 302] or (response.status_code == 404 and 'api' in response.url)
+            ok = response.status_code in [200, 301, 302] or (response.status_code == 404 and 'api' in response.url)
         except requests.exceptions.Timeout:
             logger.error(f"Connection to Kolibri timed out")
-            return False
+            ok = False
         except Exception as e:
             logger.error(f"Failed to connect to Kolibri: {e}")
-            return False
+            ok = False
+        
+        self._connection_check = (time.monotonic(), ok)
+        return ok
     
     def get_channels(self) -> List[Dict]:
         """
@@ -71,15 +184,54 @@ class KolibriClient:
         Returns:
             Channel dictionary or None
         """
+        if self._khan_academy_channel is not None:
+            return self._khan_academy_channel
+        
         channels = self.get_channels()
         for channel in channels:
             # Khan Academy channel typically has "khan" in name or id
             name = channel.get('name', '').lower()
             channel_id = channel.get('id', '').lower()
             if 'khan' in name or 'khan' in channel_id:
+                self._khan_academy_channel = channel
                 return channel
         return None
     
+    def iter_content_nodes(self, channel_id: str, kind: str = "video",
+                           parent_id: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Stream content nodes (videos, exercises, etc.) for a channel.
+        
+        Nodes are yielded as each response is parsed, following pagination.
+        Request errors are raised.
+        
+        Args:
+            channel_id: Channel ID
+            kind: Content kind filter (video, exercise, document, etc.)
+            parent_id: Optional parent node ID to get children
+            
+        Yields:
+            Content node dictionaries
+        """
+        url = f"{self.api_url}/content/contentnode"
+        params = {
+            'channel_id': channel_id,
+            'kind': kind,
+            'page_size': PAGE_SIZE,
+        }
+        if parent_id:
+            params['parent'] = parent_id
+        
+        # Handle pagination: large pages keep round trips few, and every
+        # 'next' link is followed so results beyond the first page aren't lost
+        while url:
+            page = {}
+            with self.session.get(url, params=params, stream=True) as response:
+                response.raise_for_status()
+                yield from _iter_page_items(response, page)
+            # The 'next' link already carries the query
+            url, params = page.get('next'), None
+    
     def get_content_nodes(self, channel_id: str, kind: str = "video", 
                          parent_id: Optional[str] = None) -> List[Dict]:
         """
@@ -94,21 +246,7 @@ class KolibriClient:
             List of content node dictionaries
         """
         try:
-            params = {
-                'channel_id': channel_id,
-                'kind': kind,
-            }
-            if parent_id:
-                params['parent'] = parent_id
-            
-            response = self.session.get(f"{self.api_url}/content/contentnode", params=params)
-            response.raise_for_status()
-            results = response.json()
-            
-            # Handle pagination if needed
-            if isinstance(results, dict) and 'results' in results:
-                return results['results']
-            return results if isinstance(results, list) else []
+            return list(self.iter_content_nodes(channel_id, kind, parent_id))
         except Exception as e:
             logger.error(f"Failed to get content nodes: {e}")
             return []
@@ -154,6 +292,32 @@ class KolibriClient:
             logger.error(f"Failed to get content files: {e}")
             return []
     
+    def get_video_details(self, videos: Iterable[Dict], required_fields: Iterable[str] = (),
+                          max_workers: int = MAX_WORKERS) -> Iterator[Tuple[Optional[Dict], List[Dict]]]:
+        """
+        Fetch node details and files for many content nodes concurrently.
+        
+        Args:
+            videos: Content node dictionaries (as returned by get_content_nodes)
+            required_fields: Detail fields the caller needs; a node that already
+                carries all of them is used as its own details, skipping a request
+            max_workers: Number of concurrent requests
+            
+        Yields:
+            (details, files) tuples in the same order as videos
+        """
+        required_fields = tuple(required_fields)
+        
+        def fetch(video: Dict) -> Tuple[Optional[Dict], List[Dict]]:
+            if required_fields and all(video.get(field) is not None for field in required_fields):
+                details = video
+            else:
+                details = self.get_content_node_details(video['id'])
+            return details, self.get_content_files(video['id'])
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            yield from executor.map(fetch, videos)
+    
     def get_transcript(self, content_id: str) -> Optional[str]:
         """
         Get transcript for a video content node.
@@ -176,8 +340,7 @@ class KolibriClient:
             # Fallback: check files for subtitle/transcript files
             files = self.get_content_files(content_id)
             for file_info in files:
-                file_name = file_info.get('preset', '').lower()
-                if 'subtitle' in file_name or 'transcript' in file_name:
+                if is_subtitle_file(file_info):
                     file_url = file_info.get('storage_url') or file_info.get('url')
                     if file_url:
                         file_response = self.session.get(file_url)
@@ -193,6 +356,10 @@ class KolibriClient:
         """
         Download a file from Kolibri.
         
+        The file is written to a ".part" file next to output_path and renamed
+        when complete; an interrupted download is resumed from its ".part"
+        file with a Range request.
+        
         Args:
             file_url: URL of file to download
             output_path: Local path to save file
@@ -202,13 +369,30 @@ class KolibriClient:
         """
         try:
             output_path.parent.mkdir(parents=True, exist_ok=True)
-            response = self.session.get(file_url, stream=True)
-            response.raise_for_status()
+            part_path = output_path.with_name(output_path.name + '.part')
+            resume_from = part_path.stat().st_size if part_path.exists() else 0
+            headers = {'Range': f'bytes={resume_from}-'} if resume_from else {}
             
-            with open(output_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            with self.session.get(file_url, stream=True, headers=headers) as response:
+                # 416: the partial file may already hold the whole file; anything
+                # else there (stale or oversized) is discarded and downloaded again
+                if response.status_code == 416:
+                    match = UNSATISFIED_RANGE_RE.match(response.headers.get('Content-Range', ''))
+                    if not match or int(match.group(1)) != resume_from:
+                        logger.warning(f"Discarding partial download {part_path} "
+                                       f"({resume_from} bytes) that does not match the server's file")
+                        part_path.unlink()
+                        return self.download_file(file_url, output_path)
+                else:
+                    response.raise_for_status()
+                    # 206 continues the partial file; a plain 200 restarts it
+                    mode = 'ab' if response.status_code == 206 else 'wb'
+                    response.raw.decode_content = True
+                    with open(part_path, mode) as f:
+                        # Copy in 64 KiB blocks in C rather than a Python chunk loop
+                        shutil.copyfileobj(response.raw, f, length=1 << 16)
             
+            part_path.replace(output_path)
             logger.info(f"Downloaded file to {output_path}")
             return True
         except Exception as e:
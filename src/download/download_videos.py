@@ -8,16 +8,21 @@ Khan Academy hosts videos on YouTube, so we can download them directly.
 import yt_dlp
 import json
 import logging
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from tqdm import tqdm
-import time
 import sys
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from storage.gcs_storage import GCSStorage
+from utils import fast_json
+from utils.rate_limit import RateLimiter
+from utils.subtitles import downloaded_subtitle_path
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +34,10 @@ class VideoDownloader:
     
     def __init__(self, output_dir: Path, download_video: bool = True, 
                  download_transcript: bool = True, gcs_storage: Optional[GCSStorage] = None,
-                 upload_to_gcs: bool = False, delete_after_upload: bool = True):
+                 upload_to_gcs: bool = False, delete_after_upload: bool = True,
+                 workers: int = 4, rate_limit: float = 1.0,
+                 external_downloader: Optional[str] = 'aria2c', connections: int = 16,
+                 upload_workers: int = 4, resume: bool = True):
         """
         Initialize the video downloader.
         
@@ -40,6 +48,15 @@ class VideoDownloader:
             gcs_storage: Optional GCS storage instance for uploading
             upload_to_gcs: Whether to upload files to GCS after download
             delete_after_upload: Whether to delete local files after successful GCS upload
+            workers: Number of videos downloaded concurrently
+            rate_limit: Minimum average delay between download starts across all workers, in seconds
+            external_downloader: Downloader binary for video files, used when it is
+                on PATH (None always uses yt-dlp's own downloader)
+            connections: Parallel connections per video (aria2c) or concurrent
+                fragment downloads (yt-dlp's downloader)
+            upload_workers: Number of background threads uploading finished videos to GCS
+            resume: Skip videos finished by a previous run, as recorded in the
+                progress log or, when uploading, already in the bucket
         """
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -48,6 +65,14 @@ class VideoDownloader:
         self.gcs_storage = gcs_storage
         self.upload_to_gcs = upload_to_gcs
         self.delete_after_upload = delete_after_upload
+        self.workers = workers
+        self.upload_workers = upload_workers
+        self.resume = resume
+        self._upload_executor = None
+        self._progress_log = None
+        self._progress_log_lock = threading.Lock()
+        # Shared by all workers so parallelism does not raise the request rate past the limit
+        self.rate_limiter = RateLimiter.from_delay(rate_limit)
         
         if upload_to_gcs and not gcs_storage:
             raise ValueError("gcs_storage must be provided if upload_to_gcs is True")
@@ -62,7 +87,45 @@ class VideoDownloader:
             'subtitlesformat': 'vtt',  # WebVTT format
             'quiet': False,
             'no_warnings': False,
+            'socket_timeout': 30,
+            # YouTube throttles each connection, so fetch DASH fragments in parallel
+            'concurrent_fragment_downloads': connections,
         }
+        if external_downloader and shutil.which(external_downloader):
+            # aria2c splits each file into ranges fetched over separate connections
+            self.ydl_opts['external_downloader'] = {'default': external_downloader}
+            if external_downloader == 'aria2c':
+                self.ydl_opts['external_downloader_args'] = {
+                    'aria2c': ['-x', str(connections), '-s', str(connections), '-k', '1M']
+                }
+        # One YoutubeDL per thread, reused across videos so extractor setup and
+        # HTTP connections persist
+        self._local = threading.local()
+        self._ydls = []
+        self._ydls_lock = threading.Lock()
+    
+    def _get_ydl(self):
+        """
+        Return the calling thread's YoutubeDL, creating it on first use.
+        
+        YoutubeDL is not safe to share across threads, but extractor setup
+        and its HTTP connections only need to be created once per thread.
+        """
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL(dict(self.ydl_opts))
+            self._local.ydl = ydl
+            with self._ydls_lock:
+                self._ydls.append(ydl)
+        return ydl
+    
+    def close(self):
+        """Close every YoutubeDL instance created by this downloader."""
+        with self._ydls_lock:
+            ydls, self._ydls = self._ydls, []
+            self._local = threading.local()
+        for ydl in ydls:
+            ydl.close()
     
     def download_single_video(self, video_url: str, video_metadata: Dict) -> Optional[Dict]:
         """
@@ -79,74 +142,126 @@ class VideoDownloader:
         logger.info(f"Downloading video: {video_metadata.get('title', video_id)}")
         
         try:
-            with yt_dlp.YoutubeDL(self.ydl_opts) as ydl:
-                info = ydl.extract_info(video_url, download=self.download_video)
-                
-                result = {
-                    'video_id': video_id,
-                    'title': info.get('title'),
-                    'duration': info.get('duration'),
-                    'description': info.get('description'),
-                    'upload_date': info.get('upload_date'),
-                    'view_count': info.get('view_count'),
-                    'file_path': None,
-                    'transcript_path': None,
-                    'gcs_video_path': None,
-                    'gcs_transcript_path': None,
-                }
+            ydl = self._get_ydl()
+            info = ydl.extract_info(video_url, download=self.download_video)
+            
+            result = {
+                'video_id': video_id,
+                'title': info.get('title'),
+                'duration': info.get('duration'),
+                'description': info.get('description'),
+                'upload_date': info.get('upload_date'),
+                'view_count': info.get('view_count'),
+                'file_path': None,
+                'transcript_path': None,
+                'gcs_video_path': None,
+                'gcs_transcript_path': None,
+            }
+            
+            if self.download_video:
+                # Find the downloaded file
+                filename = ydl.prepare_filename(info)
+                local_file = Path(filename)
                 
-                if self.download_video:
-                    # Find the downloaded file
-                    filename = ydl.prepare_filename(info)
-                    local_file = Path(filename)
+                if local_file.exists():
+                    result['file_path'] = str(local_file)
                     
-                    if local_file.exists():
-                        result['file_path'] = str(local_file)
-                        
-                        # Upload to GCS if configured
-                        if self.upload_to_gcs and self.gcs_storage:
-                            gcs_path = f"videos/{video_id}.{local_file.suffix[1:]}"
-                            if self.gcs_storage.upload_file(local_file, gcs_path, 
-                                                           content_type='video/mp4',
-                                                           metadata={'title': result['title']}):
-                                result['gcs_video_path'] = gcs_path
-                                
-                                # Delete local file if configured
-                                if self.delete_after_upload:
-                                    local_file.unlink()
-                                    logger.info(f"Deleted local file after GCS upload: {local_file}")
-                
-                if self.download_transcript:
-                    # Transcript should be in same directory with .vtt extension
-                    transcript_path = Path(filename).with_suffix('.en.vtt')
-                    if transcript_path.exists():
-                        result['transcript_path'] = str(transcript_path)
-                        
-                        # Upload transcript to GCS if configured
-                        if self.upload_to_gcs and self.gcs_storage:
-                            gcs_transcript_path = f"transcripts/{video_id}.vtt"
-                            if self.gcs_storage.upload_file(transcript_path, gcs_transcript_path,
-                                                           content_type='text/vtt'):
-                                result['gcs_transcript_path'] = gcs_transcript_path
-                                
-                                # Delete local transcript if configured
-                                if self.delete_after_upload:
-                                    transcript_path.unlink()
-                                    logger.info(f"Deleted local transcript after GCS upload: {transcript_path}")
-                
-                return result
-                
+                    # Upload to GCS if configured
+                    if self.upload_to_gcs and self.gcs_storage:
+                        if self._upload_executor:
+                            # Upload in the background so this worker can start its next download
+                            self._upload_executor.submit(self._upload_video, local_file, result)
+                        else:
+                            self._upload_video(local_file, result)
+            
+            if self.download_transcript:
+                # yt-dlp reports where it wrote the transcript
+                transcript_path = downloaded_subtitle_path(info)
+                if transcript_path:
+                    result['transcript_path'] = str(transcript_path)
+                    
+                    # Upload transcript to GCS if configured
+                    if self.upload_to_gcs and self.gcs_storage:
+                        gcs_transcript_path = f"transcripts/{video_id}.vtt"
+                        if self.gcs_storage.upload_file(transcript_path, gcs_transcript_path,
+                                                       content_type='text/vtt'):
+                            result['gcs_transcript_path'] = gcs_transcript_path
+                            
+                            # Delete local transcript if configured
+                            if self.delete_after_upload:
+                                transcript_path.unlink()
+                                logger.info(f"Deleted local transcript after GCS upload: {transcript_path}")
+            
+            return result
+            
         except Exception as e:
             logger.error(f"Failed to download video {video_id}: {e}")
             return None
     
-    def download_from_catalog(self, catalog_path: Path, max_videos: Optional[int] = None):
+    def _upload_video(self, local_file: Path, result: Dict):
+        """
+        Upload a downloaded video to GCS, then delete the local copy if configured.
+        
+        Args:
+            local_file: Local video file
+            result: Result dictionary for the video, updated with the GCS path
+        """
+        gcs_path = f"videos/{result['video_id']}.{local_file.suffix[1:]}"
+        if self.gcs_storage.upload_file(local_file, gcs_path,
+                                       content_type='video/mp4',
+                                       metadata={'title': result['title']}):
+            result['gcs_video_path'] = gcs_path
+            
+            # Delete local file if configured
+            if self.delete_after_upload:
+                local_file.unlink()
+                logger.info(f"Deleted local file after GCS upload: {local_file}")
+            self._record_done(result)
+    
+    def _record_done(self, result: Dict):
+        """
+        Append a finished video to the progress log, if one is open.
+        
+        Args:
+            result: Result dictionary for a fully downloaded (and uploaded) video
+        """
+        if self._progress_log is None:
+            return
+        line = fast_json.dumps({'video_id': result['video_id']}) + b'\n'
+        with self._progress_log_lock:
+            self._progress_log.write(line)
+            self._progress_log.flush()
+    
+    def _uploaded_ids(self) -> set:
+        """
+        Collect the ids of videos whose requested files are all in the bucket.
+        
+        videos/ and transcripts/ are each listed once instead of probing
+        every video with its own request.
+        
+        Returns:
+            Set of video ids that need no download
+        """
+        def ids_under(prefix):
+            names = (name[len(prefix):] for name in self.gcs_storage.list_files(prefix))
+            return {name.rsplit('.', 1)[0] for name in names if '/' not in name}
+        
+        listings = []
+        if self.download_video:
+            listings.append(ids_under("videos/"))
+        if self.download_transcript:
+            listings.append(ids_under("transcripts/"))
+        return set.intersection(*listings) if listings else set()
+    
+    def download_from_catalog(self, catalog_path: Path, max_videos: Optional[int] = None,
+                              on_result: Optional[Callable[[Dict], None]] = None):
         """
         Download all videos from a catalog file.
         
         Args:
             catalog_path: Path to JSON catalog file
             max_videos: Maximum number of videos to download (None for all)
+            on_result: Optional callback invoked with each successful result as it completes
         """
         logger.info(f"Loading catalog from {catalog_path}")
         with open(catalog_path, 'r', encoding='utf-8') as f:
@@ -158,40 +273,83 @@ class VideoDownloader:
         if max_videos:
             catalog = catalog[:max_videos]
         
+        # Every finished video is logged so an interrupted run can resume
+        progress_path = self.output_dir / "download_progress.ndjson"
+        if self.resume:
+            done = set()
+            if progress_path.exists():
+                with open(progress_path, 'rb') as f:
+                    done.update(fast_json.loads(line)['video_id'] for line in f if line.strip())
+            if self.upload_to_gcs and self.gcs_storage:
+                done |= self._uploaded_ids()
+            if done:
+                remaining = [video_meta for video_meta in catalog
+                             if (video_meta.get('youtube_id') or video_meta.get('id')) not in done]
+                logger.info(f"Resuming: skipping {len(catalog) - len(remaining)} videos that are already done")
+                catalog = remaining
+        
         results = []
         failed = []
         
         logger.info(f"Starting download of {len(catalog)} videos...")
         
-        for video_meta in tqdm(catalog, desc="Downloading videos"):
-            # Extract YouTube URL from video metadata
-            youtube_id = video_meta.get('youtube_id') or video_meta.get('id')
-            if not youtube_id:
-                logger.warning(f"No YouTube ID found for video: {video_meta}")
-                failed.append(video_meta)
-                continue
-            
-            video_url = f"https://www.youtube.com/watch?v={youtube_id}"
-            result = self.download_single_video(video_url, video_meta)
-            
-            if result:
-                results.append(result)
-            else:
-                failed.append(video_meta)
-            
-            # Rate limiting
-            time.sleep(1)
+        def download(video_url, video_meta):
+            self.rate_limiter.acquire()
+            return video_meta, self.download_single_video(video_url, video_meta)
+        
+        if self.upload_to_gcs and self.gcs_storage:
+            self._upload_executor = ThreadPoolExecutor(max_workers=self.upload_workers)
+        self._progress_log = open(progress_path, 'ab')
+        
+        # Downloads are network-bound, so run several at once; the shared rate
+        # limiter replaces the fixed one-second sleep between videos
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor, \
+                    tqdm(total=len(catalog), desc="Downloading videos") as progress:
+                futures = []
+                for video_meta in catalog:
+                    # Extract YouTube URL from video metadata
+                    youtube_id = video_meta.get('youtube_id') or video_meta.get('id')
+                    if not youtube_id:
+                        logger.warning(f"No YouTube ID found for video: {video_meta}")
+                        failed.append(video_meta)
+                        progress.update()
+                        continue
+                    
+                    video_url = f"https://www.youtube.com/watch?v={youtube_id}"
+                    futures.append(executor.submit(download, video_url, video_meta))
+                
+                for future in as_completed(futures):
+                    video_meta, result = future.result()
+                    if result:
+                        results.append(result)
+                        # Videos still uploading are logged once their upload succeeds
+                        if not (self._upload_executor and result['file_path']):
+                            self._record_done(result)
+                        if on_result:
+                            on_result(result)
+                    else:
+                        failed.append(video_meta)
+                    progress.update()
+        finally:
+            # Wait for queued uploads so results carry their GCS paths
+            if self._upload_executor:
+                self._upload_executor.shutdown(wait=True)
+                self._upload_executor = None
+            self._progress_log.close()
+            self._progress_log = None
+            # The worker threads are gone, so release their YoutubeDL instances
+            self.close()
         
         # Save download results
         results_path = self.output_dir / "download_results.json"
-        with open(results_path, 'w', encoding='utf-8') as f:
-            json.dump({
-                'successful': results,
-                'failed': failed,
-                'total': len(catalog),
-                'success_count': len(results),
-                'failed_count': len(failed)
-            }, f, indent=2, ensure_ascii=False)
+        results_path.write_bytes(fast_json.dumps({
+            'successful': results,
+            'failed': failed,
+            'total': len(catalog),
+            'success_count': len(results),
+            'failed_count': len(failed)
+        }, indent=True))
         
         logger.info(f"Download complete: {len(results)} successful, {len(failed)} failed")
         return results, failed
@@ -206,6 +364,10 @@ if __name__ == "__main__":
     parser.add_argument("--max", type=int, default=None, help="Maximum number of videos to download")
     parser.add_argument("--no-video", action="store_true", help="Don't download video files, only transcripts")
     parser.add_argument("--no-transcript", action="store_true", help="Don't download transcripts")
+    parser.add_argument("--workers", type=int, default=4, help="Number of videos to download concurrently")
+    parser.add_argument("--rate-limit", type=float, default=1.0,
+                        help="Minimum average delay between downloads across all workers, in seconds")
+    parser.add_argument("--no-aria2c", action="store_true", help="Use yt-dlp's own downloader even if aria2c is installed")
     
     args = parser.parse_args()
     
@@ -214,7 +376,10 @@ if __name__ == "__main__":
     downloader = VideoDownloader(
         output_dir=args.output,
         download_video=not args.no_video,
-        download_transcript=not args.no_transcript
+        download_transcript=not args.no_transcript,
+        workers=args.workers,
+        rate_limit=args.rate_limit,
+        external_downloader=None if args.no_aria2c else 'aria2c'
     )
     
     downloader.download_from_catalog(args.catalog, max_videos=args.max)
@@ -5,21 +5,38 @@ Processes downloaded transcripts (WebVTT format) and converts them to
 structured formats for use with aFaculty personas.
 """
 
+import gzip
+import mmap
 import re
-import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import logging
-from webvtt import WebVTT
+import numpy as np
 import sys
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from storage.gcs_storage import GCSStorage
+from utils import fast_json
 
 logger = logging.getLogger(__name__)
 
+# A WebVTT cue: timing line (hours optional, cue settings ignored) followed by
+# its non-blank text lines. Time fields are captured separately so durations
+# need no further string splitting. Bytes patterns, so they run directly on
+# the memory-mapped file and only cue text is ever decoded
+VTT_CUE_RE = re.compile(
+    rb'^(?:(\d+):)?(\d{2}):(\d{2}\.\d{3})[ \t]+-->[ \t]+(?:(\d+):)?(\d{2}):(\d{2}\.\d{3})[^\n]*\n'
+    rb'((?:[ \t]*\S[^\n]*(?:\n|$))*)',
+    re.MULTILINE
+)
+VTT_TAG_RE = re.compile(rb'<.*?>|\r')
+# Milliseconds per ASCII digit of 'MMSS.mmm' (the '.' is weighted 0)
+MMSS_MILLIS_WEIGHTS = np.array([600_000, 60_000, 10_000, 1_000, 0, 100, 10, 1], dtype=np.int64)
+
 
 class TranscriptProcessor:
     """
@@ -27,7 +44,8 @@ class TranscriptProcessor:
     """
     
     def __init__(self, transcripts_dir: Path, output_dir: Path, 
-                 gcs_storage: Optional[GCSStorage] = None, upload_to_gcs: bool = False):
+                 gcs_storage: Optional[GCSStorage] = None, upload_to_gcs: bool = False,
+                 workers: Optional[int] = None, local_output: bool = True):
         """
         Initialize the transcript processor.
         
@@ -36,12 +54,17 @@ class TranscriptProcessor:
             output_dir: Directory to save processed transcripts (temporary if uploading to GCS)
             gcs_storage: Optional GCS storage instance
             upload_to_gcs: Whether to upload processed transcripts to GCS
+            workers: Number of processes used by process_all_transcripts (defaults to the CPU count)
+            local_output: Whether to write processed transcripts to output_dir; when
+                uploading, they are sent to GCS from memory either way
         """
         self.transcripts_dir = Path(transcripts_dir)
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.gcs_storage = gcs_storage
         self.upload_to_gcs = upload_to_gcs
+        self.workers = workers
+        self.local_output = local_output
     
     def parse_vtt(self, vtt_path: Path) -> List[Dict]:
         """
@@ -53,42 +76,69 @@ class TranscriptProcessor:
         Returns:
             List of transcript segments with timestamps
         """
+        return self._segment_list(self.parse_vtt_columns(vtt_path))
+    
+    def parse_vtt_columns(self, vtt_path: Path) -> Dict:
+        """
+        Parse a WebVTT file into one column per segment field.
+        
+        Whole-transcript figures (full text, total duration) are computed
+        from the columns without building a dictionary per segment.
+        
+        Args:
+            vtt_path: Path to .vtt file
+            
+        Returns:
+            Dictionary with 'starts', 'ends' and 'texts' lists and a
+            'durations' float array, holding one entry per segment
+        """
+        columns = {'starts': [], 'ends': [], 'texts': [], 'durations': np.zeros(0)}
         try:
-            vtt = WebVTT().read(vtt_path)
-            segments = []
+            if vtt_path.stat().st_size == 0:
+                return columns
+            # Match against the mapped file rather than a decoded copy of it
+            with open(vtt_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                cues = VTT_CUE_RE.findall(mm)
+            if not cues:
+                return columns
             
-            for caption in vtt:
-                segments.append({
-                    'start': caption.start,
-                    'end': caption.end,
-                    'text': caption.text.strip(),
-                    'duration': self._calculate_duration(caption.start, caption.end)
-                })
+            # Minutes and seconds are fixed width ('MM' + 'SS.mmm'), so convert
+            # them straight from their ASCII digits with integer arithmetic:
+            # rows of (start, end) x 8 digits, weighted into milliseconds.
+            # Only the variable-width hours go through a string conversion
+            digits = np.frombuffer(b''.join(cue[1] + cue[2] + cue[4] + cue[5] for cue in cues),
+                                   dtype=np.uint8).reshape(-1, 2, 8).astype(np.int64) - ord('0')
+            millis = digits @ MMSS_MILLIS_WEIGHTS
+            hours = np.array([(cue[0] or b'0', cue[3] or b'0') for cue in cues]).astype(np.int64)
+            millis += hours * 3_600_000
             
-            return segments
+            return {
+                'starts': [b':'.join((cue[0] or b'00', cue[1], cue[2])).decode('ascii') for cue in cues],
+                'ends': [b':'.join((cue[3] or b'00', cue[4], cue[5])).decode('ascii') for cue in cues],
+                'texts': [VTT_TAG_RE.sub(b'', cue[6]).decode('utf-8').strip() for cue in cues],
+                'durations': (millis[:, 1] - millis[:, 0]) / 1000,
+            }
         except Exception as e:
             logger.error(f"Failed to parse VTT file {vtt_path}: {e}")
-            return []
+            return columns
     
-    def _calculate_duration(self, start: str, end: str) -> float:
+    def _segment_list(self, columns: Dict) -> List[Dict]:
         """
-        Calculate duration in seconds from time strings.
+        Convert parsed columns into one dictionary per segment.
         
         Args:
-            start: Start time string (HH:MM:SS.mmm)
-            end: End time string (HH:MM:SS.mmm)
+            columns: Output of parse_vtt_columns
             
         Returns:
-            Duration in seconds
+            List of transcript segments with timestamps
         """
-        def time_to_seconds(time_str: str) -> float:
-            parts = time_str.split(':')
-            hours = float(parts[0])
-            minutes = float(parts[1])
-            seconds = float(parts[2])
-            return hours * 3600 + minutes * 60 + seconds
-        
-        return time_to_seconds(end) - time_to_seconds(start)
+        return [{
+            'start': start,
+            'end': end,
+            'text': text,
+            'duration': duration
+        } for start, end, text, duration in zip(columns['starts'], columns['ends'],
+                                                 columns['texts'], columns['durations'].tolist())]
     
     def extract_full_text(self, segments: List[Dict]) -> str:
         """
@@ -113,11 +163,38 @@ class TranscriptProcessor:
         Returns:
             Processed transcript dictionary
         """
+        result, outputs = self._process_file(vtt_path, video_metadata)
+        
+        # Upload to GCS if configured
+        if self.upload_to_gcs and self.gcs_storage:
+            self.gcs_storage.upload_strings(_gzip_outputs(outputs), content_encoding='gzip')
+            logger.info(f"Uploaded processed transcript to GCS: {outputs[0][1]}")
+        
+        return result
+    
+    def _process_file(self, vtt_path: Path,
+                      video_metadata: Optional[Dict] = None) -> Tuple[Dict, List[Tuple[bytes, str, str]]]:
+        """
+        Parse a transcript file and encode its JSON and plain text outputs.
+        
+        The outputs are written to output_dir only if local_output is set.
+        
+        Args:
+            vtt_path: Path to .vtt file
+            video_metadata: Optional metadata about the video
+            
+        Returns:
+            Tuple of (processed transcript dictionary, list of
+            (content, remote_path, content_type) tuples for GCS)
+        """
         video_id = vtt_path.stem.replace('.en', '').replace('.vtt', '')
         logger.info(f"Processing transcript: {video_id}")
         
-        segments = self.parse_vtt(vtt_path)
-        full_text = self.extract_full_text(segments)
+        # Aggregates come straight from the columns; per-segment dictionaries
+        # are only built for the output
+        columns = self.parse_vtt_columns(vtt_path)
+        full_text = ' '.join(columns['texts'])
+        segments = self._segment_list(columns)
         
         result = {
             'video_id': video_id,
@@ -125,32 +202,25 @@ class TranscriptProcessor:
             'full_text': full_text,
             'word_count': len(full_text.split()),
             'segment_count': len(segments),
-            'total_duration': sum(s['duration'] for s in segments),
+            'total_duration': float(columns['durations'].sum()),
             'metadata': video_metadata or {}
         }
         
-        # Save processed transcript locally
-        output_path = self.output_dir / f"{video_id}_transcript.json"
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
+        # Processed transcript plus a plain text version
+        json_bytes = fast_json.dumps(result, indent=True)
+        text_bytes = full_text.encode('utf-8')
         
-        # Also save plain text version
-        text_path = self.output_dir / f"{video_id}_transcript.txt"
-        with open(text_path, 'w', encoding='utf-8') as f:
-            f.write(full_text)
+        if self.local_output:
+            (self.output_dir / f"{video_id}_transcript.json").write_bytes(json_bytes)
+            (self.output_dir / f"{video_id}_transcript.txt").write_bytes(text_bytes)
         
-        # Upload to GCS if configured
-        if self.upload_to_gcs and self.gcs_storage:
-            gcs_json_path = f"transcripts/processed/{video_id}_transcript.json"
-            gcs_txt_path = f"transcripts/processed/{video_id}_transcript.txt"
-            
-            self.gcs_storage.upload_file(output_path, gcs_json_path, content_type='application/json')
-            self.gcs_storage.upload_file(text_path, gcs_txt_path, content_type='text/plain')
-            
-            logger.info(f"Uploaded processed transcript to GCS: {gcs_json_path}")
+        outputs = [
+            (json_bytes, f"transcripts/processed/{video_id}_transcript.json", 'application/json'),
+            (text_bytes, f"transcripts/processed/{video_id}_transcript.txt", 'text/plain'),
+        ]
         
         logger.info(f"Processed transcript: {len(segments)} segments, {result['word_count']} words")
-        return result
+        return result, outputs
     
     def process_all_transcripts(self, transcripts_dir: Optional[Path] = None) -> List[Dict]:
         """
@@ -168,30 +238,123 @@ class TranscriptProcessor:
         vtt_files = list(Path(transcripts_dir).glob("*.vtt"))
         logger.info(f"Found {len(vtt_files)} transcript files")
         
-        results = []
-        for vtt_path in vtt_files:
-            try:
-                result = self.process_transcript(vtt_path)
-                results.append(result)
-            except Exception as e:
-                logger.error(f"Failed to process {vtt_path}: {e}")
+        results = self.process_transcripts(vtt_files)
+        self.save_summary(results)
+        return results
+    
+    def process_transcripts(self, vtt_files: List[Path]) -> List[Dict]:
+        """
+        Process the given transcript files in parallel, without saving a summary.
         
-        # Save summary
+        Args:
+            vtt_files: Paths to .vtt files
+            
+        Returns:
+            List of processed transcript dictionaries
+        """
+        if not vtt_files:
+            return []
+        
+        # Parsing and encoding are CPU-bound and independent per file, so spread
+        # them across processes; the GCS client stays here for the uploads
+        upload = self.upload_to_gcs and self.gcs_storage is not None
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.transcripts_dir, self.output_dir,
+                                           self.local_output, upload)) as executor:
+            processed = [item for item in executor.map(_process_in_worker, vtt_files, chunksize=16)
+                         if item is not None]
+        results = [result for result, _ in processed]
+        
+        # Upload to GCS if configured, straight from the encoded outputs
+        if upload:
+            uploaded = self.gcs_storage.upload_strings(
+                chain.from_iterable(outputs for _, outputs in processed),
+                content_encoding='gzip'
+            )
+            logger.info(f"Uploaded {len(uploaded)} processed transcript files to GCS")
+        
+        return results
+    
+    def save_summary(self, results: List[Dict]):
+        """
+        Save a summary of processed transcripts to the output directory.
+        
+        Args:
+            results: Processed transcript dictionaries
+        """
         summary_path = self.output_dir / "transcripts_summary.json"
-        with open(summary_path, 'w', encoding='utf-8') as f:
-            json.dump({
-                'total_transcripts': len(results),
-                'total_words': sum(r['word_count'] for r in results),
-                'total_segments': sum(r['segment_count'] for r in results),
-                'transcripts': [{
-                    'video_id': r['video_id'],
-                    'word_count': r['word_count'],
-                    'segment_count': r['segment_count']
-                } for r in results]
-            }, f, indent=2, ensure_ascii=False)
+        summary_path.write_bytes(fast_json.dumps({
+            'total_transcripts': len(results),
+            'total_words': sum(r['word_count'] for r in results),
+            'total_segments': sum(r['segment_count'] for r in results),
+            'transcripts': [{
+                'video_id': r['video_id'],
+                'word_count': r['word_count'],
+                'segment_count': r['segment_count']
+            } for r in results]
+        }, indent=True))
         
         logger.info(f"Processed {len(results)} transcripts")
-        return results
+
+
+
+def _gzip_outputs(outputs: List[Tuple[bytes, str, str]]) -> List[Tuple[bytes, str, str]]:
+    """
+    Gzip-compress encoded outputs for upload with Content-Encoding: gzip.
+    
+    Args:
+        outputs: List of (content, remote_path, content_type) tuples
+        
+    Returns:
+        The same tuples with compressed content
+    """
+    return [(gzip.compress(content, compresslevel=GCSStorage.GZIP_LEVEL), remote_path, content_type)
+            for content, remote_path, content_type in outputs]
+
+
+# Processor used by each process_all_transcripts worker process, and whether
+# the worker sends encoded outputs back to the parent for uploading
+_worker_processor = None
+_worker_returns_outputs = False
+
+
+def _init_worker(transcripts_dir: Path, output_dir: Path, local_output: bool, return_outputs: bool):
+    """
+    Set up a process_all_transcripts worker.
+    
+    Workers only parse and encode files, so their processor has no GCS
+    client, and per-file info logging is silenced.
+    
+    Args:
+        transcripts_dir: Directory containing .vtt transcript files
+        output_dir: Directory to save processed transcripts
+        local_output: Whether to write processed transcripts to output_dir
+        return_outputs: Whether to return encoded outputs for uploading
+    """
+    global _worker_processor, _worker_returns_outputs
+    _worker_processor = TranscriptProcessor(transcripts_dir, output_dir, local_output=local_output)
+    _worker_returns_outputs = return_outputs
+    logger.setLevel(logging.WARNING)
+
+
+def _process_in_worker(vtt_path: Path) -> Optional[Tuple[Dict, List[Tuple[bytes, str, str]]]]:
+    """
+    Process one transcript file in a worker process.
+    
+    Args:
+        vtt_path: Path to .vtt file
+        
+    Returns:
+        Tuple of (processed transcript dictionary, gzip-compressed outputs
+        or an empty list when not uploading), or None if processing failed
+    """
+    try:
+        result, outputs = _worker_processor._process_file(vtt_path)
+        # Compress here so it happens in parallel, not in the uploading parent
+        return result, _gzip_outputs(outputs) if _worker_returns_outputs else []
+    except Exception as e:
+        logger.error(f"Failed to process {vtt_path}: {e}")
+        return None
 
 
 if __name__ == "__main__":
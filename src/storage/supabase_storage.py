@@ -5,59 +5,213 @@ Handles uploading transcripts, videos, and chunks to Supabase with vector embedd
 """
 
 import os
+import re
+import time
+import random
 import logging
-from typing import Optional, Dict, List, Any
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Dict, List, Any, Tuple, Union
 from pathlib import Path
+import httpx
+import numpy as np
 from supabase import create_client, Client
+from postgrest.types import ReturnMethod
 import json
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import psycopg
+except ImportError:  # pragma: no cover - optional dependency
+    psycopg = None
+
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    HTTP2 = True
+except ImportError:  # pragma: no cover - optional dependency
+    HTTP2 = False
+
 logger = logging.getLogger(__name__)
 
+# Rows per bulk upsert request; chunks carry ~12 KB of embedding JSON each,
+# so this bounds the PostgREST payload size
+CHUNK_BATCH_SIZE = int(os.environ.get('SUPABASE_CHUNK_BATCH_SIZE', '500'))
+# Transcripts per stale-chunk delete; each adds ~80 characters to the
+# request URL's or= filter
+STALE_DELETE_GROUP_SIZE = 20
+
+INQUIRY_INSTITUTE_PATH = Path(__file__).parent.parent.parent.parent / "Inquiry.Institute"
+ENV_LINE_RE = re.compile(r'^([^#=]+)=(.*)$')
+
+# Bulk chunk writes at least this large go through COPY when a Postgres DSN is set
+COPY_MIN_ROWS = 5000
+CHUNK_COLUMNS = ('transcript_id', 'video_id', 'chunk_text', 'chunk_index',
+                 'start_time_seconds', 'end_time_seconds', 'embedding', 'metadata')
+
+# Connection pool of the shared PostgREST session; sized for the worker
+# pools that write through one client
+REST_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0)
+REST_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+# Attempts per PostgREST request, and the first backoff between them (seconds)
+RETRY_ATTEMPTS = 4
+RETRY_BASE_DELAY = 0.1
+
+# Columns returned by the get_* lookups unless others are requested; the
+# wide text columns (description, raw_vtt) are left out
+VIDEO_LOOKUP_COLUMNS = 'id,youtube_id,title,khan_topic,khan_subject,khan_course,duration_seconds'
+TRANSCRIPT_LOOKUP_COLUMNS = 'id,video_id,youtube_id,full_text,word_count,metadata'
+
+# Rows kept by the get_* lookup cache, and how long they stay fresh (seconds)
+LOOKUP_CACHE_SIZE = 4096
+LOOKUP_CACHE_TTL = 300
+
+
+@lru_cache(maxsize=1)
+def load_inquiry_institute_env() -> Dict[str, str]:
+    """
+    Read ../Inquiry.Institute/.env.local (or .env) once per process.
+    
+    Returns:
+        Mapping of variable name to value (empty if no file is found)
+    """
+    env_vars = {}
+    try:
+        env_path = INQUIRY_INSTITUTE_PATH / ".env.local"
+        if not env_path.exists():
+            env_path = INQUIRY_INSTITUTE_PATH / ".env"
+        
+        if env_path.exists():
+            with open(env_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith('#'):
+                        continue
+                    match = ENV_LINE_RE.match(line)
+                    if match:
+                        env_vars[match.group(1).strip()] = match.group(2).strip().strip('"\'')
+    except Exception as e:
+        logger.debug(f"Could not load credentials from Inquiry.Institute: {e}")
+    return env_vars
+
+
+def encode_embedding(embedding: Optional[List[float]]) -> Any:
+    """
+    Encode an embedding as a pgvector text literal.
+    
+    The embedding column holds at most float32 precision (halfvec since
+    migration 006), so each value is written as the shortest decimal that
+    round-trips to the same float32: about half the JSON of the float64
+    list, with nothing lost that the server would keep. Without orjson the
+    list is returned unchanged.
+    
+    Args:
+        embedding: Embedding vector, or None
+    
+    Returns:
+        '[...]' literal accepted by a vector column, or the input if it can't be encoded
+    """
+    if embedding is None or orjson is None:
+        return embedding
+    return orjson.dumps(np.asarray(embedding, dtype=np.float32),
+                        option=orjson.OPT_SERIALIZE_NUMPY).decode('ascii')
+
+
+def dedupe_chunks(chunks: List[Dict[str, Any]], transcript_id: str) -> List[Dict[str, Any]]:
+    """
+    Keep the last chunk for each chunk_index.
+    
+    A single upsert cannot touch the same (transcript_id, chunk_index) row
+    twice, so one duplicate would fail its whole batch.
+    
+    Args:
+        chunks: Chunk dictionaries of one transcript
+        transcript_id: UUID of the transcript (for logging)
+    
+    Returns:
+        Chunks with unique chunk_index values, in first-seen order
+    """
+    unique = {chunk['chunk_index']: chunk for chunk in chunks}
+    if len(unique) < len(chunks):
+        logger.warning(f"Dropped {len(chunks) - len(unique)} duplicate chunk indexes for transcript {transcript_id}")
+        return list(unique.values())
+    return chunks
+
+
+def execute_with_retry(query: Any) -> Any:
+    """
+    Execute a PostgREST query, retrying transient network failures.
+    
+    Connection errors and timeouts are retried with jittered exponential
+    backoff; API errors (bad requests, constraint or schema violations) are
+    permanent and raised immediately, as is the last network failure.
+    
+    Args:
+        query: Request builder (e.g. client.table(...).upsert(...))
+    
+    Returns:
+        The query's APIResponse
+    """
+    delay = RETRY_BASE_DELAY
+    for attempt in range(1, RETRY_ATTEMPTS + 1):
+        try:
+            return query.execute()
+        except httpx.TransportError as e:
+            if attempt == RETRY_ATTEMPTS:
+                raise
+            logger.warning(f"Supabase request failed ({e}), retrying ({attempt}/{RETRY_ATTEMPTS - 1})")
+            time.sleep(delay + random.uniform(0, delay))
+            delay *= 2
+
+
+@lru_cache(maxsize=None)
+def get_client(supabase_url: str, supabase_key: str) -> Client:
+    """
+    Get the shared Supabase client for a project URL and key.
+    
+    SupabaseStorage instances with the same credentials reuse one client, and
+    so one pool of open connections, instead of each paying for new TLS handshakes.
+    The PostgREST session is replaced with a sized, keep-alive pool that speaks
+    HTTP/2 when h2 is installed, multiplexing concurrent requests over one
+    TLS connection.
+    """
+    client = create_client(supabase_url, supabase_key)
+    session = client.postgrest.session
+    client.postgrest.session = httpx.Client(base_url=session.base_url, headers=session.headers,
+                                            http2=HTTP2, limits=REST_LIMITS, timeout=REST_TIMEOUT)
+    session.close()
+    return client
+
 
 class SupabaseStorage:
     """
     Handles storage and retrieval of Khan Academy transcripts in Supabase.
     """
     
-    def __init__(self, supabase_url: Optional[str] = None, supabase_key: Optional[str] = None):
+    def __init__(self, supabase_url: Optional[str] = None, supabase_key: Optional[str] = None,
+                 postgres_dsn: Optional[str] = None):
         """
         Initialize Supabase client.
         
         Args:
             supabase_url: Supabase project URL (or use SUPABASE_URL env var)
             supabase_key: Supabase service role key (or use SUPABASE_KEY env var)
+            postgres_dsn: Direct (or pooled, port 6543) Postgres connection string
+                used to COPY large chunk backfills (or use SUPABASE_DB_URL env var;
+                requires psycopg)
         """
         # Try to load from Inquiry.Institute .env.local if not provided
         if not supabase_url or not supabase_key:
-            try:
-                from pathlib import Path
-                import re
-                
-                inquiry_institute_path = Path(__file__).parent.parent.parent.parent / "Inquiry.Institute"
-                env_path = inquiry_institute_path / ".env.local"
-                
-                if not env_path.exists():
-                    env_path = inquiry_institute_path / ".env"
-                
-                if env_path.exists():
-                    with open(env_path, 'r', encoding='utf-8') as f:
-                        for line in f:
-                            line = line.strip()
-                            if not line or line.startswith('#'):
-                                continue
-                            match = re.match(r'^([^#=]+)=(.*)$', line)
-                            if match:
-                                key = match.group(1).strip()
-                                value = match.group(2).strip().strip('"\'')
-                                if key == 'NEXT_PUBLIC_SUPABASE_URL' and not supabase_url:
-                                    supabase_url = value
-                                elif key == 'SUPABASE_SERVICE_ROLE_KEY' and not supabase_key:
-                                    supabase_key = value
-                                elif key == 'NEXT_PUBLIC_SUPABASE_ANON_KEY' and not supabase_key:
-                                    # Fallback to anon key if service role not available
-                                    supabase_key = value
-            except Exception as e:
-                logger.debug(f"Could not load credentials from Inquiry.Institute: {e}")
+            env_vars = load_inquiry_institute_env()
+            supabase_url = supabase_url or env_vars.get('NEXT_PUBLIC_SUPABASE_URL')
+            # Fall back to the anon key if the service role key isn't available
+            supabase_key = (supabase_key or env_vars.get('SUPABASE_SERVICE_ROLE_KEY')
+                            or env_vars.get('NEXT_PUBLIC_SUPABASE_ANON_KEY'))
         
         self.supabase_url = supabase_url or os.environ.get('SUPABASE_URL') or os.environ.get('NEXT_PUBLIC_SUPABASE_URL')
         self.supabase_key = supabase_key or os.environ.get('SUPABASE_KEY') or os.environ.get('SUPABASE_SERVICE_ROLE_KEY') or os.environ.get('NEXT_PUBLIC_SUPABASE_ANON_KEY')
@@ -70,9 +224,46 @@ class SupabaseStorage:
                 "Will also try to load from ../Inquiry.Institute/.env.local"
             )
         
-        self.client: Client = create_client(self.supabase_url, self.supabase_key)
+        self.client: Client = get_client(self.supabase_url, self.supabase_key)
+        self.postgres_dsn = postgres_dsn or os.environ.get('SUPABASE_DB_URL')
+        # (table, key, columns) -> (expiry, row) for get_video_by_youtube_id and
+        # get_transcript_by_video_id, least recently used first
+        self._lookup_cache: OrderedDict = OrderedDict()
+        self._lookup_lock = threading.Lock()
         logger.info("Supabase client initialized")
     
+    def _cached_row(self, table: str, column: str, value: str, columns: str) -> Optional[Dict[str, Any]]:
+        """Fetch columns of the row of table whose column equals value, serving fresh cached copies."""
+        key = (table, value, columns)
+        now = time.monotonic()
+        with self._lookup_lock:
+            entry = self._lookup_cache.get(key)
+            if entry and entry[0] > now:
+                self._lookup_cache.move_to_end(key)
+                return dict(entry[1])
+        
+        result = execute_with_retry(self.client.table(table).select(columns).eq(column, value))
+        if not result.data:
+            return None
+        row = result.data[0]
+        with self._lookup_lock:
+            self._lookup_cache[key] = (now + LOOKUP_CACHE_TTL, row)
+            self._lookup_cache.move_to_end(key)
+            if len(self._lookup_cache) > LOOKUP_CACHE_SIZE:
+                self._lookup_cache.popitem(last=False)
+        return dict(row)
+    
+    def _invalidate_rows(self, table: str, values: Optional[List[str]] = None):
+        """Drop cached rows of table for the given keys (all of them if values is None)."""
+        with self._lookup_lock:
+            if values is None:
+                for key in [key for key in self._lookup_cache if key[0] == table]:
+                    del self._lookup_cache[key]
+            else:
+                values = set(values)
+                for key in [key for key in self._lookup_cache if key[0] == table and key[1] in values]:
+                    del self._lookup_cache[key]
+    
     def upsert_video(self, video_data: Dict[str, Any]) -> Optional[str]:
         """
         Insert or update a video record.
@@ -89,20 +280,11 @@ class SupabaseStorage:
             Video UUID if successful, None otherwise
         """
         try:
-            # Check if video exists
-            result = self.client.table('khan_videos').select('id').eq('youtube_id', video_data['youtube_id']).execute()
-            
-            if result.data:
-                # Update existing
-                video_id = result.data[0]['id']
-                self.client.table('khan_videos').update(video_data).eq('id', video_id).execute()
-                logger.info(f"Updated video: {video_data['youtube_id']}")
-            else:
-                # Insert new
-                result = self.client.table('khan_videos').insert(video_data).execute()
-                video_id = result.data[0]['id'] if result.data else None
-                logger.info(f"Inserted video: {video_data['youtube_id']}")
-            
+            # One round trip, and no race between concurrent writers of the same video
+            result = execute_with_retry(self.client.table('khan_videos').upsert(video_data, on_conflict='youtube_id'))
+            self._invalidate_rows('khan_videos', [video_data['youtube_id']])
+            video_id = result.data[0]['id'] if result.data else None
+            logger.info(f"Upserted video: {video_data['youtube_id']}")
             return video_id
         except Exception as e:
             logger.error(f"Failed to upsert video {video_data.get('youtube_id')}: {e}")
@@ -124,36 +306,37 @@ class SupabaseStorage:
             Transcript UUID if successful, None otherwise
         """
         try:
-            # If youtube_id provided, get video_id
+            # If only youtube_id is provided, resolve the video and upsert server-side
             if 'youtube_id' in transcript_data and 'video_id' not in transcript_data:
-                video_result = self.client.table('khan_videos').select('id').eq('youtube_id', transcript_data['youtube_id']).execute()
-                if not video_result.data:
+                result = execute_with_retry(self.client.rpc(
+                    'upsert_transcript_by_youtube_id',
+                    {
+                        'p_youtube_id': transcript_data['youtube_id'],
+                        'p_full_text': transcript_data['full_text'],
+                        'p_raw_vtt': transcript_data.get('raw_vtt'),
+                        'p_word_count': transcript_data.get('word_count'),
+                        'p_metadata': transcript_data.get('metadata')
+                    }
+                ))
+                # The video UUID isn't known here, so no single cache entry can be targeted
+                self._invalidate_rows('khan_transcripts')
+                if not result.data:
                     logger.error(f"Video not found for youtube_id: {transcript_data['youtube_id']}")
                     return None
-                transcript_data['video_id'] = video_result.data[0]['id']
-            
-            # Check if transcript exists
-            result = self.client.table('khan_transcripts').select('id').eq('video_id', transcript_data['video_id']).execute()
-            
-            if result.data:
-                # Update existing
-                transcript_id = result.data[0]['id']
-                # Remove video_id from update (already set)
-                update_data = {k: v for k, v in transcript_data.items() if k != 'video_id'}
-                self.client.table('khan_transcripts').update(update_data).eq('id', transcript_id).execute()
-                logger.info(f"Updated transcript for video_id: {transcript_data['video_id']}")
-            else:
-                # Insert new
-                result = self.client.table('khan_transcripts').insert(transcript_data).execute()
-                transcript_id = result.data[0]['id'] if result.data else None
-                logger.info(f"Inserted transcript for video_id: {transcript_data['video_id']}")
+                logger.info(f"Upserted transcript for youtube_id: {transcript_data['youtube_id']}")
+                return result.data
             
+            result = execute_with_retry(self.client.table('khan_transcripts').upsert(transcript_data, on_conflict='video_id'))
+            self._invalidate_rows('khan_transcripts', [transcript_data['video_id']])
+            transcript_id = result.data[0]['id'] if result.data else None
+            logger.info(f"Upserted transcript for video_id: {transcript_data['video_id']}")
             return transcript_id
         except Exception as e:
             logger.error(f"Failed to upsert transcript: {e}")
             return None
     
-    def upsert_chunks(self, chunks: List[Dict[str, Any]], transcript_id: str, video_id: str) -> int:
+    def upsert_chunks(self, chunks: List[Dict[str, Any]], transcript_id: str, video_id: str,
+                      batch_size: int = CHUNK_BATCH_SIZE) -> int:
         """
         Insert or update transcript chunks with embeddings.
         
@@ -162,10 +345,13 @@ class SupabaseStorage:
                 - chunk_text (required)
                 - chunk_index (required)
                 - start_time_seconds, end_time_seconds (optional)
-                - embedding (vector, optional)
+                - embedding (vector, optional; need not be L2-normalized,
+                  as search ranks by cosine distance)
                 - metadata (jsonb, optional)
             transcript_id: UUID of the transcript
             video_id: UUID of the video
+            batch_size: Maximum rows per upsert request (SUPABASE_CHUNK_BATCH_SIZE
+                env var by default); a failed batch is logged and skipped
         
         Returns:
             Number of chunks successfully inserted/updated
@@ -174,36 +360,223 @@ class SupabaseStorage:
             return 0
         
         try:
-            # Delete existing chunks for this transcript
-            self.client.table('khan_transcript_chunks').delete().eq('transcript_id', transcript_id).execute()
-            
             # Prepare chunks with required fields
-            chunks_to_insert = []
-            for chunk in chunks:
-                chunk_data = {
+            chunks_to_insert = [
+                {
                     'transcript_id': transcript_id,
                     'video_id': video_id,
                     'chunk_text': chunk['chunk_text'],
                     'chunk_index': chunk['chunk_index'],
                     'start_time_seconds': chunk.get('start_time_seconds'),
                     'end_time_seconds': chunk.get('end_time_seconds'),
-                    'embedding': chunk.get('embedding'),
+                    'embedding': encode_embedding(chunk.get('embedding')),
                     'metadata': chunk.get('metadata', {})
                 }
-                chunks_to_insert.append(chunk_data)
-            
-            # Insert all chunks
-            result = self.client.table('khan_transcript_chunks').insert(chunks_to_insert).execute()
-            count = len(result.data) if result.data else 0
-            logger.info(f"Inserted {count} chunks for transcript {transcript_id}")
-            return count
+                for chunk in dedupe_chunks(chunks, transcript_id)
+            ]
         except Exception as e:
-            logger.error(f"Failed to upsert chunks: {e}")
+            logger.error(f"Failed to prepare chunks for transcript {transcript_id}: {e}")
             return 0
+        
+        # Upsert in batches so one failing batch doesn't lose the whole transcript;
+        # existing chunks are overwritten in place, so searches never see the
+        # transcript without chunks
+        count = 0
+        for start in range(0, len(chunks_to_insert), batch_size):
+            batch = chunks_to_insert[start:start + batch_size]
+            try:
+                # Only the row count is needed, so don't have the embeddings echoed back
+                execute_with_retry(self.client.table('khan_transcript_chunks').upsert(
+                    batch, on_conflict='transcript_id,chunk_index', returning=ReturnMethod.minimal
+                ))
+                count += len(batch)
+            except Exception as e:
+                logger.error(f"Failed to upsert chunks {start}-{start + batch_size} "
+                             f"for transcript {transcript_id}: {e}")
+        
+        # Drop chunks left over from a longer previous version of the transcript
+        try:
+            last_index = max(chunk['chunk_index'] for chunk in chunks_to_insert)
+            execute_with_retry(self.client.table('khan_transcript_chunks').delete().eq(
+                'transcript_id', transcript_id
+            ).gt('chunk_index', last_index))
+        except Exception as e:
+            logger.error(f"Failed to delete stale chunks for transcript {transcript_id}: {e}")
+        
+        logger.info(f"Upserted {count} chunks for transcript {transcript_id}")
+        return count
+    
+    def upsert_videos_bulk(self, videos: List[Dict[str, Any]],
+                           batch_size: int = CHUNK_BATCH_SIZE) -> Dict[str, str]:
+        """
+        Insert or update many video records, one upsert request per batch.
+        
+        Args:
+            videos: Video metadata dictionaries (see upsert_video)
+            batch_size: Maximum rows per upsert request
+        
+        Returns:
+            Mapping of youtube_id to video UUID for the rows written
+        """
+        video_ids = {}
+        for start in range(0, len(videos), batch_size):
+            batch = videos[start:start + batch_size]
+            try:
+                result = execute_with_retry(self.client.table('khan_videos').upsert(batch, on_conflict='youtube_id'))
+                self._invalidate_rows('khan_videos', [video['youtube_id'] for video in batch])
+                video_ids.update((row['youtube_id'], row['id']) for row in result.data or [])
+            except Exception as e:
+                logger.error(f"Failed to upsert {len(batch)} videos: {e}")
+        if videos:
+            logger.info(f"Upserted {len(video_ids)} videos")
+        return video_ids
+    
+    def upsert_transcripts_bulk(self, transcripts: List[Dict[str, Any]],
+                                batch_size: int = CHUNK_BATCH_SIZE) -> Dict[str, str]:
+        """
+        Insert or update many transcript records, one upsert request per batch.
+        
+        Args:
+            transcripts: Transcript dictionaries, each with a video_id (see upsert_transcript)
+            batch_size: Maximum rows per upsert request
+        
+        Returns:
+            Mapping of video UUID to transcript UUID for the rows written
+        """
+        transcript_ids = {}
+        for start in range(0, len(transcripts), batch_size):
+            batch = transcripts[start:start + batch_size]
+            try:
+                result = execute_with_retry(self.client.table('khan_transcripts').upsert(batch, on_conflict='video_id'))
+                self._invalidate_rows('khan_transcripts', [transcript['video_id'] for transcript in batch])
+                transcript_ids.update((row['video_id'], row['id']) for row in result.data or [])
+            except Exception as e:
+                logger.error(f"Failed to upsert {len(batch)} transcripts: {e}")
+        if transcripts:
+            logger.info(f"Upserted {len(transcript_ids)} transcripts")
+        return transcript_ids
+    
+    def upsert_chunks_bulk(self, batches: List[Tuple[List[Dict[str, Any]], str, str]],
+                           insert_batch_size: int = CHUNK_BATCH_SIZE) -> int:
+        """
+        Replace the chunks of many transcripts.
+        
+        Backfills of COPY_MIN_ROWS chunks or more are streamed with COPY when a
+        Postgres DSN is configured, falling back to PostgREST upserts on error.
+        
+        Args:
+            batches: (chunks, transcript_id, video_id) tuples (see upsert_chunks)
+            insert_batch_size: Maximum rows per upsert request, bounding the
+                payload size when chunks carry embeddings
+        
+        Returns:
+            Number of chunks successfully written
+        """
+        if not batches:
+            return 0
+        
+        transcript_ids = [transcript_id for _, transcript_id, _ in batches]
+        try:
+            chunks_to_insert = [
+                {
+                    'transcript_id': transcript_id,
+                    'video_id': video_id,
+                    'chunk_text': chunk['chunk_text'],
+                    'chunk_index': chunk['chunk_index'],
+                    'start_time_seconds': chunk.get('start_time_seconds'),
+                    'end_time_seconds': chunk.get('end_time_seconds'),
+                    'embedding': encode_embedding(chunk.get('embedding')),
+                    'metadata': chunk.get('metadata', {})
+                }
+                for chunks, transcript_id, video_id in batches
+                for chunk in dedupe_chunks(chunks, transcript_id)
+            ]
+        except Exception as e:
+            logger.error(f"Failed to prepare chunks: {e}")
+            return 0
+        
+        if self.postgres_dsn and psycopg is not None and len(chunks_to_insert) >= COPY_MIN_ROWS:
+            try:
+                count = self._copy_chunks(transcript_ids, chunks_to_insert)
+                logger.info(f"Copied {count} chunks for {len(batches)} transcripts")
+                return count
+            except Exception as e:
+                logger.warning(f"COPY of {len(chunks_to_insert)} chunks failed, falling back to PostgREST: {e}")
+        
+        # Existing chunks are overwritten in place, so searches never see a
+        # transcript without chunks; a failed batch leaves its old rows in place
+        # and the remaining batches still go through
+        count = 0
+        for start in range(0, len(chunks_to_insert), insert_batch_size):
+            batch = chunks_to_insert[start:start + insert_batch_size]
+            try:
+                execute_with_retry(self.client.table('khan_transcript_chunks').upsert(
+                    batch, on_conflict='transcript_id,chunk_index', returning=ReturnMethod.minimal
+                ))
+                count += len(batch)
+            except Exception as e:
+                logger.error(f"Failed to upsert chunks {start}-{start + len(batch)} "
+                             f"of {len(batches)} transcripts: {e}")
+        
+        # Drop chunks left over from longer previous versions of the transcripts,
+        # a few transcripts per request to keep the filter URL short
+        last_indexes = {transcript_id: -1 for transcript_id in transcript_ids}
+        for chunk in chunks_to_insert:
+            last_indexes[chunk['transcript_id']] = max(last_indexes[chunk['transcript_id']], chunk['chunk_index'])
+        last_indexes = list(last_indexes.items())
+        for start in range(0, len(last_indexes), STALE_DELETE_GROUP_SIZE):
+            group = last_indexes[start:start + STALE_DELETE_GROUP_SIZE]
+            try:
+                execute_with_retry(self.client.table('khan_transcript_chunks').delete().or_(','.join(
+                    f"and(transcript_id.eq.{transcript_id},chunk_index.gt.{last_index})"
+                    for transcript_id, last_index in group
+                )))
+            except Exception as e:
+                logger.error(f"Failed to delete stale chunks of {len(group)} transcripts: {e}")
+        
+        logger.info(f"Upserted {count} chunks for {len(batches)} transcripts")
+        return count
+    
+    def _copy_chunks(self, transcript_ids: List[str], chunks_to_insert: List[Dict[str, Any]]) -> int:
+        """
+        Replace the chunks of the given transcripts using COPY.
+        
+        Rows are streamed into a temporary staging table, then swapped in with
+        one DELETE and one INSERT ... SELECT in the same transaction, so
+        readers never see a transcript without chunks.
+        
+        Args:
+            transcript_ids: UUIDs of the transcripts being replaced
+            chunks_to_insert: Chunk rows with the CHUNK_COLUMNS keys
+        
+        Returns:
+            Number of chunks inserted
+        """
+        columns = ', '.join(CHUNK_COLUMNS)
+        # Transaction-mode poolers (pgbouncer on 6543) can't hold prepared statements
+        with psycopg.connect(self.postgres_dsn, prepare_threshold=None) as conn:
+            with conn.cursor() as cur:
+                cur.execute("CREATE TEMP TABLE khan_transcript_chunks_staging "
+                            "(LIKE public.khan_transcript_chunks INCLUDING DEFAULTS) ON COMMIT DROP")
+                with cur.copy(f"COPY khan_transcript_chunks_staging ({columns}) FROM STDIN") as copy:
+                    for chunk in chunks_to_insert:
+                        embedding = chunk['embedding']
+                        if embedding is not None and not isinstance(embedding, str):
+                            embedding = str(list(embedding))
+                        copy.write_row((
+                            chunk['transcript_id'], chunk['video_id'], chunk['chunk_text'],
+                            chunk['chunk_index'], chunk['start_time_seconds'], chunk['end_time_seconds'],
+                            embedding, json.dumps(chunk['metadata'])
+                        ))
+                cur.execute("DELETE FROM public.khan_transcript_chunks WHERE transcript_id = ANY(%s::uuid[])",
+                            (transcript_ids,))
+                cur.execute(f"INSERT INTO public.khan_transcript_chunks ({columns}) "
+                            f"SELECT {columns} FROM khan_transcript_chunks_staging")
+                return cur.rowcount
     
     def search_chunks(self, query_embedding: List[float], match_threshold: float = 0.7, 
-                     match_count: int = 10, topic_filter: Optional[str] = None,
-                     subject_filter: Optional[str] = None) -> List[Dict[str, Any]]:
+                     match_count: int = 10, topic_filter: Optional[Union[str, List[str]]] = None,
+                     subject_filter: Optional[Union[str, List[str]]] = None) -> List[Dict[str, Any]]:
         """
         Search transcript chunks by vector similarity.
         
@@ -211,15 +584,21 @@ class SupabaseStorage:
             query_embedding: Query vector (1536 dimensions)
             match_threshold: Minimum similarity threshold (0-1)
             match_count: Maximum number of results
-            topic_filter: Optional topic filter
-            subject_filter: Optional subject filter
+            topic_filter: Optional topic, or list of topics to match any of
+            subject_filter: Optional subject, or list of subjects to match any of
         
         Returns:
             List of matching chunks with metadata
         """
+        # The search function takes text[] filters
+        if isinstance(topic_filter, str):
+            topic_filter = [topic_filter]
+        if isinstance(subject_filter, str):
+            subject_filter = [subject_filter]
+        
         try:
             # Call the search function
-            result = self.client.rpc(
+            result = execute_with_retry(self.client.rpc(
                 'search_transcript_chunks',
                 {
                     'query_embedding': query_embedding,
@@ -228,27 +607,27 @@ class SupabaseStorage:
                     'topic_filter': topic_filter,
                     'subject_filter': subject_filter
                 }
-            ).execute()
+            ))
             
             return result.data if result.data else []
         except Exception as e:
             logger.error(f"Failed to search chunks: {e}")
             return []
     
-    def get_video_by_youtube_id(self, youtube_id: str) -> Optional[Dict[str, Any]]:
-        """Get video by YouTube ID."""
+    def get_video_by_youtube_id(self, youtube_id: str,
+                                columns: str = VIDEO_LOOKUP_COLUMNS) -> Optional[Dict[str, Any]]:
+        """Get video by YouTube ID (cached for LOOKUP_CACHE_TTL seconds); pass columns='*' for every column."""
         try:
-            result = self.client.table('khan_videos').select('*').eq('youtube_id', youtube_id).execute()
-            return result.data[0] if result.data else None
+            return self._cached_row('khan_videos', 'youtube_id', youtube_id, columns)
         except Exception as e:
             logger.error(f"Failed to get video {youtube_id}: {e}")
             return None
     
-    def get_transcript_by_video_id(self, video_id: str) -> Optional[Dict[str, Any]]:
-        """Get transcript by video UUID."""
+    def get_transcript_by_video_id(self, video_id: str,
+                                   columns: str = TRANSCRIPT_LOOKUP_COLUMNS) -> Optional[Dict[str, Any]]:
+        """Get transcript by video UUID (cached for LOOKUP_CACHE_TTL seconds); pass columns='*' for every column."""
         try:
-            result = self.client.table('khan_transcripts').select('*').eq('video_id', video_id).execute()
-            return result.data[0] if result.data else None
+            return self._cached_row('khan_transcripts', 'video_id', video_id, columns)
         except Exception as e:
             logger.error(f"Failed to get transcript for video {video_id}: {e}")
             return None
@@ -0,0 +1 @@
+"""Shared helper utilities."""
@@ -0,0 +1,87 @@
+"""
+Helpers for reading video catalog JSON files.
+
+Catalogs can hold tens of thousands of videos, so they are streamed with
+ijson when it is installed instead of being loaded in one piece, and
+serialized with orjson when it is available.
+"""
+
+import logging
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Union
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover - optional dependency
+    ijson = None
+
+from utils import fast_json
+
+logger = logging.getLogger(__name__)
+
+
+def iter_catalog(catalog_path: Union[str, Path], max_videos: Optional[int] = None) -> Iterator[Dict]:
+    """
+    Iterate over the video entries in a catalog file.
+    
+    A catalog is normally a JSON array of video dictionaries; a single
+    top-level object is treated as a one-video catalog.
+    
+    Args:
+        catalog_path: Path to JSON catalog file
+        max_videos: Maximum number of videos to yield (None for all)
+        
+    Yields:
+        Video metadata dictionaries
+    """
+    with open(catalog_path, 'rb') as f:
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        
+        if ijson is not None and first == b'[':
+            items = ijson.items(f, 'item', use_float=True)
+        else:
+            catalog = fast_json.loads(f.read())
+            items = catalog if isinstance(catalog, list) else [catalog]
+        
+        yield from islice(items, max_videos or None)
+
+
+def load_catalog(catalog_path: Union[str, Path], max_videos: Optional[int] = None) -> list:
+    """
+    Load up to max_videos entries from a catalog file into a list.
+    
+    Args:
+        catalog_path: Path to JSON catalog file
+        max_videos: Maximum number of videos to load (None for all)
+        
+    Returns:
+        List of video metadata dictionaries
+    """
+    return list(iter_catalog(catalog_path, max_videos))
+
+
+def save_catalog(videos: Iterable[Dict], catalog_path: Union[str, Path]):
+    """
+    Write a catalog to a JSON file, creating parent directories as needed.
+    
+    Args:
+        videos: Video metadata dictionaries
+        catalog_path: Path to JSON catalog file
+    """
+    catalog_path = Path(catalog_path)
+    catalog_path.parent.mkdir(parents=True, exist_ok=True)
+    
+    # Encode one video at a time, indented as an element of the top-level
+    # array, so the whole catalog never exists as a single bytes object.
+    # The output matches fast_json.dumps(list(videos), indent=True).
+    with open(catalog_path, 'wb') as f:
+        separator = b'[\n  '
+        for video in videos:
+            f.write(separator)
+            f.write(fast_json.dumps(video, indent=True).replace(b'\n', b'\n  '))
+            separator = b',\n  '
+        f.write(b'[]' if separator == b'[\n  ' else b'\n]')
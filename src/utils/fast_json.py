@@ -0,0 +1,42 @@
+"""
+JSON encoding helpers that use orjson when it is installed.
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def dumps(data: Any, indent: bool = False) -> bytes:
+    """
+    Serialize data to UTF-8 JSON bytes.
+    
+    Args:
+        data: JSON-serializable object
+        indent: Pretty-print with a two-space indent
+        
+    Returns:
+        Encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(data, indent=2 if indent else None, ensure_ascii=False).encode('utf-8')
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Deserialize JSON bytes or text.
+    
+    Args:
+        data: Encoded JSON
+        
+    Returns:
+        Decoded object
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,76 @@
+"""
+On-disk HTTP response caching for the Khan Academy clients.
+
+Topic trees and video pages rarely change between runs, so responses are
+kept in a SQLite cache with requests-cache when it is installed. Cache
+hits skip the network and the rate limiter entirely.
+"""
+
+import logging
+import sqlite3
+from datetime import timedelta
+from pathlib import Path
+from typing import Optional, Union
+
+import requests
+
+try:
+    import requests_cache
+except ImportError:  # pragma: no cover - optional dependency
+    requests_cache = None
+
+logger = logging.getLogger(__name__)
+
+# How long a cached response is served before it is fetched again
+DEFAULT_EXPIRE_AFTER = timedelta(days=1)
+
+
+def cached_session(cache_path: Optional[Union[str, Path]],
+                   expire_after: timedelta = DEFAULT_EXPIRE_AFTER) -> requests.Session:
+    """
+    Create a session that caches successful responses on disk.
+    
+    Args:
+        cache_path: SQLite cache file (without extension); None disables caching
+        expire_after: Lifetime of a cached response
+    
+    Returns:
+        CachedSession, or a plain Session if caching is disabled,
+        requests-cache is not installed or the cache can't be created
+        (e.g. a read-only working directory)
+    """
+    if cache_path is None or requests_cache is None:
+        return requests.Session()
+    
+    cache_path = Path(cache_path)
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        return requests_cache.CachedSession(
+            str(cache_path),
+            backend='sqlite',
+            expire_after=expire_after,
+            allowable_codes=(200,),
+            stale_if_error=True,
+        )
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"HTTP cache unavailable at {cache_path}, continuing without it: {e}")
+        return requests.Session()
+
+
+def get_cached(session: requests.Session, url: str, **kwargs) -> Optional[requests.Response]:
+    """
+    Return a fresh cached response for a GET request without touching the network.
+    
+    Args:
+        session: Session to look up (plain sessions never have cached responses)
+        url: Request URL
+        **kwargs: Other arguments to session.get (params, timeout, ...)
+    
+    Returns:
+        Cached response, or None on a cache miss
+    """
+    if requests_cache is None or not isinstance(session, requests_cache.CachedSession):
+        return None
+    
+    response = session.get(url, only_if_cached=True, **kwargs)
+    return response if getattr(response, 'from_cache', False) else None
@@ -0,0 +1,122 @@
+"""
+Thread-safe token-bucket rate limiting.
+
+Lets concurrent workers share a single request budget instead of each
+sleeping independently.
+"""
+
+import threading
+import time
+from typing import Optional
+
+
+class RateLimiter:
+    """
+    Token bucket shared across threads.
+    
+    Tokens refill continuously at ``rate`` per second up to ``capacity``;
+    ``acquire`` blocks until a token is available.
+    """
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Initialize rate limiter.
+        
+        Args:
+            rate: Sustained requests per second (0 or less disables limiting)
+            capacity: Maximum burst size (defaults to 1 request)
+        """
+        self.rate = rate
+        self.capacity = capacity or 1.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_delay(cls, delay: float, capacity: Optional[float] = None) -> 'RateLimiter':
+        """
+        Create a limiter equivalent to sleeping ``delay`` seconds between requests.
+        
+        Args:
+            delay: Minimum average delay between requests in seconds
+            capacity: Maximum burst size
+        
+        Returns:
+            RateLimiter instance
+        """
+        return cls(1.0 / delay if delay > 0 else 0, capacity)
+    
+    def acquire(self):
+        """Block until a request may be made."""
+        if self.rate <= 0:
+            return
+        
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """
+    Token bucket that slows down when the server starts throttling.
+    
+    Each ``throttled`` call halves the rate and pauses all callers with an
+    exponential backoff; every ``recovery`` consecutive ``succeeded`` calls
+    double the rate again, up to the configured maximum.
+    """
+    
+    MAX_BACKOFF = 60.0
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None,
+                 min_rate: Optional[float] = None, recovery: int = 20):
+        """
+        Initialize adaptive rate limiter.
+        
+        Args:
+            rate: Maximum sustained requests per second (0 or less disables the bucket)
+            capacity: Maximum burst size (defaults to 1 request)
+            min_rate: Lowest rate throttling can reduce to (defaults to rate / 32)
+            recovery: Consecutive successes needed before the rate is doubled
+        """
+        super().__init__(rate, capacity)
+        self.max_rate = rate
+        self.min_rate = min_rate if min_rate is not None else rate / 32
+        self.recovery = recovery
+        self._successes = 0
+        self._strikes = 0
+        self._paused_until = 0.0
+    
+    def acquire(self):
+        """Block until any backoff has elapsed and a request may be made."""
+        while True:
+            with self._lock:
+                wait = self._paused_until - time.monotonic()
+            if wait <= 0:
+                break
+            time.sleep(wait)
+        super().acquire()
+    
+    def throttled(self):
+        """Record a rate-limit response (e.g. HTTP 429) and back off."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._strikes += 1
+            self._successes = 0
+            self._paused_until = time.monotonic() + min(self.MAX_BACKOFF, 2.0 ** self._strikes)
+    
+    def succeeded(self):
+        """Record a successful request, ramping the rate back up over time."""
+        with self._lock:
+            self._successes += 1
+            if self._successes >= self.recovery:
+                self._successes = 0
+                self._strikes = max(0, self._strikes - 1)
+                self.rate = min(self.max_rate, self.rate * 2)
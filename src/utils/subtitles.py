@@ -0,0 +1,58 @@
+"""
+Helpers for locating subtitles written by yt-dlp and extracting their text.
+"""
+
+import re
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+
+def downloaded_subtitle_path(info: Dict, lang: str = 'en') -> Optional[Path]:
+    """
+    Return the path yt-dlp wrote a subtitle track to.
+    
+    yt-dlp records the output filename in ``requested_subtitles``, so the
+    file does not have to be probed under each possible name.
+    
+    Args:
+        info: Info dictionary returned by ``YoutubeDL.extract_info``
+        lang: Subtitle language code
+        
+    Returns:
+        Path to the subtitle file, or None if none was written
+    """
+    subtitle = (info.get('requested_subtitles') or {}).get(lang) or {}
+    filepath = subtitle.get('filepath')
+    return Path(filepath) if filepath else None
+
+
+# Everything in a WebVTT file that is not caption text: header and metadata
+# lines, cue numbers, timing lines and inline tags such as <c> or <00:00:01.000>
+_VTT_NOISE_RE = re.compile(
+    r'^(?:WEBVTT.*|Kind:.*|Language:.*|NOTE.*|\d+|\d{2}:\d{2}(?::\d{2})?\.\d{3} --> .*)$|<[^>]+>',
+    re.MULTILINE
+)
+
+
+def vtt_to_text(data: Union[bytes, str]) -> str:
+    """
+    Convert WebVTT content to plain text in a single regex pass.
+    
+    Consecutive duplicate lines (produced by YouTube's rolling
+    auto-captions) are collapsed.
+    
+    Args:
+        data: WebVTT file content
+        
+    Returns:
+        Caption text joined with spaces
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8', errors='replace')
+    
+    lines = []
+    for line in _VTT_NOISE_RE.sub('', data).splitlines():
+        line = line.strip()
+        if line and (not lines or lines[-1] != line):
+            lines.append(line)
+    return ' '.join(lines)
@@ -0,0 +1,20 @@
+-- Make (transcript_id, chunk_index) unique on khan_transcript_chunks
+-- Lets chunk writes upsert on this key instead of deleting and reinserting
+-- every chunk of a transcript
+
+-- Older writes could store duplicates; keep the newest row per key
+DELETE FROM public.khan_transcript_chunks d
+USING (
+  SELECT id, row_number() OVER (
+    PARTITION BY transcript_id, chunk_index
+    ORDER BY updated_at DESC NULLS LAST, created_at DESC NULLS LAST, id DESC
+  ) AS rn
+  FROM public.khan_transcript_chunks
+) ranked
+WHERE d.id = ranked.id AND ranked.rn > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_khan_chunks_transcript_chunk_index
+ON public.khan_transcript_chunks(transcript_id, chunk_index);
+
+-- The unique index also serves lookups by transcript_id alone
+DROP INDEX IF EXISTS public.idx_khan_chunks_transcript_id;
@@ -0,0 +1,20 @@
+-- Make video_id unique on khan_transcripts (one transcript per video)
+-- Lets transcript writes upsert on video_id in a single request
+
+-- Older writes could store duplicates; keep the newest row per key
+-- (chunks of the removed transcripts are deleted with them by ON DELETE CASCADE)
+DELETE FROM public.khan_transcripts d
+USING (
+  SELECT id, row_number() OVER (
+    PARTITION BY video_id
+    ORDER BY updated_at DESC NULLS LAST, created_at DESC NULLS LAST, id DESC
+  ) AS rn
+  FROM public.khan_transcripts
+) ranked
+WHERE d.id = ranked.id AND ranked.rn > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_khan_transcripts_video_id_unique
+ON public.khan_transcripts(video_id);
+
+-- Superseded by the unique index
+DROP INDEX IF EXISTS public.idx_khan_transcripts_video_id;
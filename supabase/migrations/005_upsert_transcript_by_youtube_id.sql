@@ -0,0 +1,39 @@
+-- Upsert a transcript given the video's YouTube ID
+-- Resolves the video and writes the transcript in one round trip. Columns
+-- left NULL keep their stored value when the transcript already exists.
+
+CREATE OR REPLACE FUNCTION upsert_transcript_by_youtube_id(
+  p_youtube_id text,
+  p_full_text text,
+  p_raw_vtt text DEFAULT NULL,
+  p_word_count int DEFAULT NULL,
+  p_metadata jsonb DEFAULT NULL
+)
+RETURNS uuid AS $$
+DECLARE
+  v_video_id uuid;
+  v_transcript_id uuid;
+BEGIN
+  SELECT id INTO v_video_id
+  FROM public.khan_videos
+  WHERE youtube_id = p_youtube_id;
+  
+  IF v_video_id IS NULL THEN
+    RETURN NULL;
+  END IF;
+  
+  INSERT INTO public.khan_transcripts AS t (video_id, youtube_id, full_text, raw_vtt, word_count, metadata)
+  VALUES (v_video_id, p_youtube_id, p_full_text, p_raw_vtt, p_word_count, COALESCE(p_metadata, '{}'::jsonb))
+  ON CONFLICT (video_id) DO UPDATE SET
+    youtube_id = EXCLUDED.youtube_id,
+    full_text = EXCLUDED.full_text,
+    raw_vtt = COALESCE(p_raw_vtt, t.raw_vtt),
+    word_count = COALESCE(p_word_count, t.word_count),
+    metadata = COALESCE(p_metadata, t.metadata)
+  RETURNING id INTO v_transcript_id;
+  
+  RETURN v_transcript_id;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION upsert_transcript_by_youtube_id IS 'Insert or update the transcript of the video with the given YouTube ID; returns NULL if the video does not exist';
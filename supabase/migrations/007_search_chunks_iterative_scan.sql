@@ -0,0 +1,59 @@
+-- Keep filtered similarity search from coming back short (pgvector >= 0.8)
+-- With a plain index scan the topic/subject filters are applied to the
+-- index's top results, so a selective filter can leave fewer than
+-- match_count rows. An HNSW index with iterative scans keeps walking the
+-- graph until enough rows pass the filters.
+
+DROP INDEX IF EXISTS public.idx_khan_chunks_embedding;
+
+CREATE INDEX IF NOT EXISTS idx_khan_chunks_embedding ON public.khan_transcript_chunks USING hnsw (embedding halfvec_cosine_ops);
+
+-- Filters become arrays so several topics/subjects can be matched with ANY()
+DROP FUNCTION IF EXISTS search_transcript_chunks(vector, float, int, text, text);
+
+CREATE OR REPLACE FUNCTION search_transcript_chunks(
+  query_embedding vector(1536),
+  match_threshold float DEFAULT 0.7,
+  match_count int DEFAULT 10,
+  topic_filter text[] DEFAULT NULL,
+  subject_filter text[] DEFAULT NULL
+)
+RETURNS TABLE (
+  chunk_id uuid,
+  video_id uuid,
+  youtube_id text,
+  title text,
+  chunk_text text,
+  similarity float,
+  start_time_seconds float,
+  end_time_seconds float,
+  metadata jsonb
+) AS $$
+DECLARE
+  query_half halfvec(1536) := query_embedding::halfvec(1536);
+BEGIN
+  RETURN QUERY
+    SELECT 
+      c.id as chunk_id,
+      c.video_id,
+      v.youtube_id,
+      v.title,
+      c.chunk_text,
+      1 - (c.embedding <=> query_half) as similarity,
+      c.start_time_seconds,
+      c.end_time_seconds,
+      c.metadata
+    FROM public.khan_transcript_chunks c
+    JOIN public.khan_videos v ON c.video_id = v.id
+    WHERE 
+      c.embedding IS NOT NULL
+      AND (topic_filter IS NULL OR v.khan_topic = ANY(topic_filter))
+      AND (subject_filter IS NULL OR v.khan_subject = ANY(subject_filter))
+      AND (1 - (c.embedding <=> query_half)) >= match_threshold
+    ORDER BY c.embedding <=> query_half
+    LIMIT match_count;
+END;
+$$ LANGUAGE plpgsql
+SET hnsw.iterative_scan = 'strict_order';
+
+COMMENT ON FUNCTION search_transcript_chunks IS 'Search transcript chunks by vector similarity with optional topic/subject filters';